@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from maze import Maze
+from maze import open_degrees
+
+
+def degrees(maze):
+    """Returns the number of openings of every cell, not counting openings
+        in the outer walls."""
+    return open_degrees(*maze.open_edge_masks())
+
+
+def corridor_lengths(maze, degree):
+    """
+    Returns the lengths of all corridors, which are chains of cells with
+    exactly two openings, counted from the maze's corridor labels, see
+    Maze.corridor_labels.
+    """
+    lengths = np.bincount(maze.corridor_labels[degree.ravel() == 2],
+                          minlength=degree.size)
+    return lengths[lengths > 0]
+
+
+def optimal_path_turns(maze):
+    """
+    Returns the number of turns on the shortest path from the start to the
+    goal room given by Maze.goal_path. A path cell is a turn if one of its
+    path openings is horizontal and the other one vertical.
+    """
+    right, up = maze.goal_path
+    horizontal = right.astype(np.int8)
+    horizontal[1:, :] += right[:-1, :]
+    vertical = up.astype(np.int8)
+    vertical[:, 1:] += up[:, :-1]
+    return int(np.count_nonzero((horizontal == 1) & (vertical == 1)))
+
+
+def analyze(maze):
+    """Returns a dictionary of statistics describing the maze's structure."""
+    degree = degrees(maze)
+    junctions = degree >= 3
+    lengths = corridor_lengths(maze, degree)
+    n = maze.dim * maze.dim
+    edges = int(degree.sum()) // 2
+    components = int(np.count_nonzero(
+        maze.labels.ravel() == np.arange(n)))
+    optimum = maze.shortest_distance_to_goal
+
+    histogram = np.bincount(lengths)
+    return {
+        'dim': maze.dim,
+        'dead_ends': int(np.count_nonzero(degree == 1)),
+        'junctions': int(np.count_nonzero(junctions)),
+        # Average number of branches to choose from when entering a junction
+        'branching_factor': (float(np.mean(degree[junctions] - 1))
+                             if junctions.any() else 0.0),
+        'corridors': int(lengths.size),
+        'corridor_length_histogram': {
+            str(length): int(count)
+            for length, count in enumerate(histogram) if count},
+        'components': components,
+        # Number of independent cycles (cycle rank) of the maze graph
+        'loops': int(edges - n + components),
+        'optimal_path_length': optimum,
+        'optimal_path_turns': (optimal_path_turns(maze)
+                               if optimum is not None else None)}
+
+
+if __name__ == '__main__':
+    '''
+    This script reports structural statistics of mazes, which can be used to
+    predict how expensive exploring them will be, e.g.
+    python analyze.py maze_01.txt maze_02.txt --json stats.json
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('mazes', nargs='+', help='maze files')
+    parser.add_argument('--json', help='also write the statistics to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for maze_file in args.mazes:
+        stats = analyze(Maze(maze_file))
+        report[os.path.basename(maze_file)] = stats
+        print('{}:'.format(maze_file))
+        for name, value in stats.items():
+            print('  {:<27}{}'.format(name, value))
+
+    if args.json:
+        with open(args.json, 'w') as file_object:
+            json.dump(report, file_object, indent=2)
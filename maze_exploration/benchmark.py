@@ -0,0 +1,274 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from maze import Maze
+from robot import BRANCH_POLICIES
+from robot import Robot
+from run import max_time
+from run import new_trial
+from run import run_trial
+from strategies import STRATEGIES
+
+
+def timed_trial(maze, strategy, seed=None, time_limit=max_time):
+    """
+    Runs a single trial of a robot with the given strategy and time limit
+    without logging and returns the trial result, extended by the number of
+    decisions the robot made and the time it spent making them.
+    """
+    testrobot = Robot(maze.dim, strategy=strategy, log_filename=None,
+                      verbose=False, seed=seed)
+
+    # Wrap the robot's decision function to measure only the time spent
+    # inside the robot, not inside the simulator.
+    decisions = [0, 0.0]
+    next_move = testrobot.next_move
+
+    def timed_next_move(sensors):
+        start = time.perf_counter()
+        action = next_move(sensors)
+        decisions[1] += time.perf_counter() - start
+        decisions[0] += 1
+        return action
+
+    testrobot.next_move = timed_next_move
+
+    result = run_trial(maze, testrobot, verbose=False,
+                       trial=new_trial(time_limit))
+    result['decisions'], result['decision_time'] = decisions
+    return result
+
+
+def pool_trial(task):
+    """Runs a timed trial in a worker process on a maze in shared memory."""
+    from sharedmaze import attach_maze
+    descriptor, strategy, seed, time_limit = task
+    return timed_trial(attach_maze(descriptor), strategy, seed, time_limit)
+
+
+def peak_memory(maze, strategy, seed=None, time_limit=max_time):
+    """Returns the peak memory in bytes allocated during a single trial."""
+    tracemalloc.start()
+    try:
+        testrobot = Robot(maze.dim, strategy=strategy, log_filename=None,
+                          verbose=False, seed=seed)
+        run_trial(maze, testrobot, verbose=False, trial=new_trial(time_limit))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def seeds(seed, repeats):
+    """Returns the seeds of repeated trials, which are random if seed is None."""
+    if seed is None:
+        return [None] * repeats
+    return list(range(seed, seed + repeats))
+
+
+def benchmark(maze_files, strategies, repeats, seed=None, workers=1,
+              time_limit=max_time):
+    """
+    Runs every strategy on every maze repeatedly and returns a list with one
+    dictionary of averaged measurements per strategy and maze. With more
+    than one worker, the trials run in a pool of processes which share the
+    maze through shared memory.
+    """
+    pool = None
+    if workers > 1:
+        # Shared memory requires Python 3.8, which single process runs don't.
+        from sharedmaze import SharedMaze
+        pool = multiprocessing.Pool(workers)
+    report = []
+    try:
+        for maze_file in maze_files:
+            maze = Maze(maze_file)
+            if not maze.reaches_goal([0, 0]):
+                # Don't waste time on simulating mazes that can't be solved.
+                report.append({'maze': os.path.basename(maze_file),
+                               'solvable': False})
+                continue
+            shared_maze = SharedMaze(maze) if pool is not None else None
+            try:
+                for strategy in strategies:
+                    if pool is not None:
+                        results = pool.map(pool_trial, [
+                            (shared_maze.descriptor, strategy, trial_seed,
+                             time_limit)
+                            for trial_seed in seeds(seed, repeats)])
+                    else:
+                        results = [timed_trial(maze, strategy, trial_seed,
+                                               time_limit)
+                                   for trial_seed in seeds(seed, repeats)]
+                    report.append(summarize(maze_file, maze, strategy,
+                                            results, seed, time_limit))
+            finally:
+                if shared_maze is not None:
+                    shared_maze.close()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return report
+
+
+def summarize(maze_file, maze, strategy, results, seed, time_limit=max_time):
+    """Averages the results of the trials of a strategy on a maze."""
+    completed = [r for r in results if r['score'] is not None]
+    decision_time = sum(r['decision_time'] for r in results)
+    return {
+        'maze': os.path.basename(maze_file),
+        'strategy': strategy,
+        'solvable': True,
+        'trials': len(results),
+        'completed': len(completed),
+        'training_steps': mean([r['runtimes'][0] for r in completed]),
+        'race_steps': mean([r['runtimes'][1] for r in completed]),
+        'optimal_race_steps': maze.optimal_race_steps,
+        'score': mean([r['score'] for r in completed]),
+        'decisions_per_sec': (sum(r['decisions'] for r in results) /
+                              decision_time if decision_time else None),
+        'peak_memory': peak_memory(maze, strategy, seed, time_limit)}
+
+
+def compare_policies(maze_files, policies, repeats, seed=0,
+                     time_limit=max_time):
+    """
+    Explores every maze with Trémaux' algorithm using every branch policy,
+    once per seed, and returns a list with the mean and variance of the
+    steps until the goal room was first entered, per policy and maze. Every
+    trial ends when the goal room is first entered or the time limit is
+    exceeded.
+    """
+    report = []
+    for maze_file in maze_files:
+        maze = Maze(maze_file)
+        if not maze.reaches_goal([0, 0]):
+            continue
+        for policy in policies:
+            steps = []
+            for trial_seed in seeds(seed, repeats):
+                testrobot = Robot(maze.dim, log_filename=None, verbose=False,
+                                  branch_policy=policy, seed=trial_seed)
+                first_goal = run_trial(maze, testrobot, verbose=False,
+                                       trial=new_trial(time_limit),
+                                       stop_at_goal=True)['first_goal']
+                if first_goal is not None:
+                    steps.append(first_goal)
+            report.append({
+                'maze': os.path.basename(maze_file),
+                'policy': policy,
+                'trials': repeats,
+                'reached': len(steps),
+                'mean': statistics.mean(steps) if steps else None,
+                'variance': (statistics.variance(steps) if len(steps) > 1
+                             else None)})
+    return report
+
+
+def format_value(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def print_report(report):
+    header = ('{:<14}{:<12}{:>7}{:>10}{:>10}{:>10}{:>11}{:>14}{:>12}'.format(
+        'maze', 'strategy', 'done', 'training', 'race', 'opt race', 'score',
+        'decisions/s', 'memory KiB'))
+    print(header)
+    print('-' * len(header))
+    for row in report:
+        if not row['solvable']:
+            print('{:<14}goal room unreachable, skipped'.format(row['maze']))
+            continue
+        print('{:<14}{:<12}{:>7}{:>10}{:>10}{:>10}{:>11}{:>14}{:>12}'.format(
+            row['maze'], row['strategy'],
+            '{}/{}'.format(row['completed'], row['trials']),
+            format_value(row['training_steps'], '.1f'),
+            format_value(row['race_steps'], '.1f'),
+            row['optimal_race_steps'],
+            format_value(row['score'], '.3f'),
+            format_value(row['decisions_per_sec'], '.0f'),
+            format_value(row['peak_memory'] / 1024., '.1f')))
+
+
+def print_policy_report(report):
+    header = '{:<14}{:<14}{:>9}{:>12}{:>12}'.format(
+        'maze', 'policy', 'reached', 'mean steps', 'variance')
+    print(header)
+    print('-' * len(header))
+    for row in report:
+        print('{:<14}{:<14}{:>9}{:>12}{:>12}'.format(
+            row['maze'], row['policy'],
+            '{}/{}'.format(row['reached'], row['trials']),
+            format_value(row['mean'], '.1f'),
+            format_value(row['variance'], '.1f')))
+
+
+if __name__ == '__main__':
+    '''
+    This script runs every registered exploration strategy on a corpus of
+    mazes and reports their performance, so that the best strategy can be
+    picked for each kind of maze. With --compare-policies, it compares the
+    branch policies of Trémaux' algorithm instead.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('mazes', nargs='*',
+                        help='maze files, defaults to all bundled mazes')
+    parser.add_argument('-s', '--strategy', action='append',
+                        choices=sorted(STRATEGIES),
+                        help='strategy to benchmark, defaults to all')
+    parser.add_argument('-n', '--repeats', type=int, default=10,
+                        help='trials per strategy and maze')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the first trial, following trials use '
+                             'the next seeds; random if omitted')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes for the trials')
+    parser.add_argument('--max-time', type=int, default=max_time,
+                        help='time limit of every trial in steps')
+    parser.add_argument('--compare-policies', action='store_true',
+                        help='compare the steps until the goal room is first '
+                             'entered for every branch policy')
+    parser.add_argument('--min-rate', type=float,
+                        help='fail if a strategy makes fewer decisions per '
+                             'second on any maze')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    maze_files = args.mazes or sorted(glob.glob(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'maze_*.txt')))
+    if args.compare_policies:
+        report = compare_policies(maze_files, sorted(BRANCH_POLICIES),
+                                  args.repeats, args.seed or 0,
+                                  args.max_time)
+        print_policy_report(report)
+    else:
+        report = benchmark(maze_files, args.strategy or sorted(STRATEGIES),
+                           args.repeats, args.seed, args.workers,
+                           args.max_time)
+        print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file_object:
+            json.dump(report, file_object, indent=2)
+
+    if args.min_rate is not None and not args.compare_policies:
+        slow = [row for row in report if row['solvable'] and
+                row['decisions_per_sec'] is not None and
+                row['decisions_per_sec'] < args.min_rate]
+        for row in slow:
+            print('{} on {}: {:.0f} decisions per second, expected at least '
+                  '{:.0f}'.format(row['strategy'], row['maze'],
+                                  row['decisions_per_sec'], args.min_rate),
+                  file=sys.stderr)
+        if slow:
+            sys.exit(1)
@@ -0,0 +1,59 @@
+import io
+import json
+import os
+import struct
+
+import numpy as np
+
+from robot import Robot
+
+# A checkpoint file starts with a magic and a format version, followed by a
+# compressed numpy archive. The archive holds the robot's maps and other
+# arrays, and a 'meta' array with the JSON encoded plain values of the robot
+# and the trial state.
+HEADER = struct.Struct('<4sH')
+MAGIC = b'MZCK'
+VERSION = 1
+
+
+def save_checkpoint(filename, robot, trial):
+    """
+    Saves the state of the robot and of the trial (see run.new_trial) to a
+    checkpoint file. The file is replaced atomically, so an interrupted
+    save leaves the previous checkpoint intact.
+    """
+    values, arrays = robot.get_state()
+    meta = json.dumps({'robot': values, 'trial': trial}).encode('utf-8')
+    arrays['meta'] = np.frombuffer(meta, dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as file_object:
+        file_object.write(HEADER.pack(MAGIC, VERSION))
+        file_object.write(buffer.getvalue())
+        file_object.flush()
+        os.fsync(file_object.fileno())
+    os.replace(temp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """
+    Loads a checkpoint file and returns the restored robot and trial state.
+    The robot's path log is cut back to the step at which the checkpoint was
+    saved, so that a resumed trial logs exactly the same path as an
+    uninterrupted one.
+    """
+    with open(filename, 'rb') as file_object:
+        magic, version = HEADER.unpack(file_object.read(HEADER.size))
+        if magic != MAGIC:
+            raise Exception('Not a checkpoint file: ' + filename)
+        if version != VERSION:
+            raise Exception('Unsupported checkpoint version {}!'.format(
+                version))
+        with np.load(io.BytesIO(file_object.read())) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+
+    meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+    return Robot.from_state(meta['robot'], arrays), meta['trial']
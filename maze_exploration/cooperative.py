@@ -0,0 +1,180 @@
+import argparse
+
+import numpy as np
+
+from maze import Maze
+from robot import Robot
+from run import apply_move
+from run import goal_reached
+from run import sense
+from run import train_score_mult
+
+
+class SharedMap(object):
+    """Maze and path maps shared by a team of robots exploring the same maze."""
+
+    def __init__(self, maze_dim):
+        self.maze_map = [[0 for _ in range(maze_dim)] for _ in range(maze_dim)]
+        self.path_map = [[Robot.Cell() for _ in range(maze_dim)] for _ in
+                         range(maze_dim)]
+        # Unvisited cells that a robot is heading to, mapped to that robot.
+        self.claims = {}
+
+
+def default_starts(maze, agents):
+    """
+    Spreads the robots over distinct cells which are connected to the
+    regular start position: over the corners of the maze first, starting
+    with the regular start position, and then each further robot on the cell
+    farthest from the robots placed before it. There are no more robots than
+    connected cells.
+    """
+    dim = maze.dim
+    corners = [(0, 0), (dim - 1, dim - 1), (dim - 1, 0), (0, dim - 1)]
+    starts = [corner for corner in corners
+              if maze.reachable([0, 0], list(corner))][:agents]
+    cells = np.argwhere(maze.labels == maze.labels[0, 0])
+    distance = np.abs(cells - starts[0]).sum(axis=1)
+    for start in starts[1:]:
+        distance = np.minimum(distance, np.abs(cells - start).sum(axis=1))
+    while len(starts) < min(agents, len(cells)):
+        start = tuple(int(i) for i in cells[np.argmax(distance)])
+        starts.append(start)
+        distance = np.minimum(distance, np.abs(cells - start).sum(axis=1))
+    return starts
+
+
+def run_team(maze, starts, max_time=None, verbose=True):
+    """
+    Explores the maze with one robot per start cell. All robots share one
+    map and step concurrently, one move per robot and time step, until every
+    robot has finished. Afterwards, a new robot races to the goal on the
+    shared map from the regular start position.
+
+    Returns a dictionary with the time steps until the map was built
+    ('total_steps'), the moves of every robot ('agent_steps'), the number
+    of cells first visited by every robot ('agent_cells'), the time steps of
+    the race ('race_steps') and the 'score' of exploration and race, which
+    is None if the robots did not finish in time.
+
+    Mazes in which the goal room cannot be reached from the regular start
+    position are not explored; their 'race_steps' and 'score' are None, as
+    they are if the robots finished without mapping a path to the goal.
+    Start cells must be connected to the regular start position.
+    """
+    outside = [list(start) for start in starts
+               if not maze.reachable([0, 0], list(start))]
+    if outside:
+        raise ValueError('Start cells not connected to the regular start '
+                         'position: {}'.format(outside))
+    if not maze.reaches_goal([0, 0]):
+        if verbose:
+            print("Goal room cannot be reached from the start, skipping maze.")
+        return {'total_steps': 0, 'agent_steps': [0 for _ in starts],
+                'agent_cells': [0 for _ in starts], 'race_steps': None,
+                'score': None}
+
+    shared_map = SharedMap(maze.dim)
+    agents = [Robot(maze.dim, strategy='cooperative', log_filename=None,
+                    verbose=False, start=start, shared_map=shared_map)
+              for start in starts]
+    poses = [{'location': list(start), 'heading': 'up'} for start in starts]
+    agent_steps = [0 for _ in agents]
+    active = [True for _ in agents]
+
+    total_steps = 0
+    while any(active):
+        total_steps += 1
+        if max_time is not None and total_steps > max_time:
+            if verbose:
+                print("Allotted time exceeded.")
+            return {'total_steps': total_steps - 1, 'agent_steps': agent_steps,
+                    'agent_cells': [a.strategy.visited for a in agents],
+                    'race_steps': None, 'score': None}
+
+        for i, (agent, robot_pos) in enumerate(zip(agents, poses)):
+            if not active[i]:
+                continue
+            agent_steps[i] += 1
+            rotation, movement = agent.next_move(sense(maze, robot_pos))
+            if (rotation, movement) == ('Reset', 'Reset'):
+                active[i] = False
+                if verbose:
+                    print("Robot {} finished exploring after {} steps.".format(
+                        i, agent_steps[i]))
+            else:
+                apply_move(maze, robot_pos, rotation, movement, verbose)
+
+    # Race to the goal on the shared map
+    racer = Robot(maze.dim, log_filename=None, verbose=False,
+                  shared_map=shared_map)
+    if not racer.find_shortest_path():
+        if verbose:
+            print("The shared map has no path to the goal.")
+        return {'total_steps': total_steps, 'agent_steps': agent_steps,
+                'agent_cells': [agent.strategy.visited for agent in agents],
+                'race_steps': None, 'score': None}
+    racer.switch_to_race()
+    robot_pos = {'location': [0, 0], 'heading': 'up'}
+    race_steps = 0
+    while not goal_reached(maze, robot_pos['location']):
+        race_steps += 1
+        rotation, movement = racer.next_move(sense(maze, robot_pos))
+        apply_move(maze, robot_pos, rotation, movement, verbose)
+
+    return {'total_steps': total_steps, 'agent_steps': agent_steps,
+            'agent_cells': [agent.strategy.visited for agent in agents],
+            'race_steps': race_steps,
+            'score': race_steps + train_score_mult * total_steps}
+
+
+def parse_cell(text):
+    x, y = text.split(',')
+    return int(x), int(y)
+
+
+if __name__ == '__main__':
+    '''
+    This script explores a maze with teams of robots sharing one map and
+    reports how long it takes to build the map with each team size, e.g.
+    python cooperative.py maze_03.txt -n 1 -n 2 -n 4 -n 8
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('maze', help='maze file')
+    parser.add_argument('-n', '--agents', type=int, action='append',
+                        help='number of robots, may be given several times')
+    parser.add_argument('--start', type=parse_cell, action='append',
+                        help='start cell of a robot as x,y, may be given '
+                             'once per robot; defaults to the maze corners and'
+                             ' further cells spread over the maze')
+    args = parser.parse_args()
+
+    maze = Maze(args.maze)
+    if args.start:
+        teams = [args.start]
+    else:
+        teams = [default_starts(maze, n) for n in args.agents or [1]]
+
+    if not maze.reaches_goal([0, 0]):
+        parser.exit(1, "Goal room cannot be reached from the start.\n")
+    for starts in teams:
+        outside = [list(start) for start in starts
+                   if not maze.reachable([0, 0], list(start))]
+        if outside:
+            parser.error('start cells {} are not connected to the regular '
+                         'start position'.format(outside))
+
+    for starts in teams:
+        result = run_team(maze, starts, verbose=False)
+        if result['score'] is None:
+            print("{} robot(s): map built after {} steps, no path to the "
+                  "goal".format(len(starts), result['total_steps']))
+        else:
+            print("{} robot(s): map built after {} steps, race {} steps, "
+                  "score {:4.3f}".format(len(starts), result['total_steps'],
+                                         result['race_steps'],
+                                         result['score']))
+        for i, start in enumerate(starts):
+            print("  robot {} from {}: {} steps, {} cells discovered".format(
+                i, list(start), result['agent_steps'][i],
+                result['agent_cells'][i]))
@@ -0,0 +1,288 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+
+from maze import Maze
+from robot import Robot
+from run import max_time
+from run import new_trial
+from run import run_trial
+
+
+class RunningStats(object):
+    """Running mean and variance of a series of values (Welford's method)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Trials in which the robot did not finish
+        self.failures = 0
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """Sample variance of the values."""
+        return self.m2 / (self.n - 1) if self.n > 1 else float('inf')
+
+    def half_width(self, alpha):
+        """Half width of the (1 - alpha) confidence interval of the mean."""
+        if self.n < 2:
+            return float('inf')
+        return (t_quantile(1 - alpha / 2, self.n - 1) *
+                math.sqrt(self.variance / self.n))
+
+
+def incomplete_beta(x, a, b):
+    """
+    Regularized incomplete beta function I_x(a, b), evaluated with the
+    continued fraction of Numerical Recipes (modified Lentz's method).
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    # The continued fraction converges quickly below the mean of the beta
+    # distribution, use the symmetry relation above it.
+    if x > (a + 1) / (a + b + 2):
+        return 1 - incomplete_beta(1 - x, b, a)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log(1 - x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 0.0
+    fraction = 1.0
+    for i in range(400):
+        m = i // 2
+        if i == 0:
+            numerator = 1.0
+        elif i % 2:
+            numerator = -((a + m) * (a + b + m) * x /
+                          ((a + 2 * m) * (a + 2 * m + 1)))
+        else:
+            numerator = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+        d = 1 + numerator * d
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = 1 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        fraction *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return front * (fraction - 1)
+
+
+def t_cdf(t, df):
+    """Cumulative distribution function of Student's t-distribution."""
+    tail = 0.5 * incomplete_beta(df / (df + t * t), df / 2.0, 0.5)
+    return 1 - tail if t > 0 else tail
+
+
+def t_quantile(p, df):
+    """
+    Quantile of Student's t-distribution for p above 0.5, found by bisection
+    on t_cdf(), which is exact to double precision even for the small
+    significance levels of the Bonferroni correction.
+    """
+    low, high = 0.0, 1.0
+    while t_cdf(high, df) < p:
+        low, high = high, 2 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        if middle in (low, high):
+            break
+        if t_cdf(middle, df) < p:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def separated(a, b, alpha):
+    """
+    Returns true if the confidence interval of the difference between the
+    means of a and b (Welch's method) excludes zero.
+    """
+    if a.n < 2 or b.n < 2:
+        return False
+    va, vb = a.variance / a.n, b.variance / b.n
+    if va + vb == 0:
+        return a.mean != b.mean
+    df = (va + vb) ** 2 / (va ** 2 / (a.n - 1) + vb ** 2 / (b.n - 1))
+    half_width = t_quantile(1 - alpha / 2, max(df, 1)) * math.sqrt(va + vb)
+    return abs(a.mean - b.mean) > half_width
+
+
+def parse_config(text):
+    """Parses a robot configuration given as strategy[:branch_policy]."""
+    strategy, _, branch_policy = text.partition(':')
+    return {'strategy': strategy, 'branch_policy': branch_policy or 'random'}
+
+
+def trial_score(maze, config, seed, time_limit=max_time):
+    """Returns the score of a trial of a robot configuration, or None if the
+        robot did not finish within the time limit."""
+    testrobot = Robot(maze.dim, log_filename=None, verbose=False, seed=seed,
+                      **config)
+    return run_trial(maze, testrobot, verbose=False,
+                     trial=new_trial(time_limit))['score']
+
+
+def pool_trial_score(task):
+    """Runs a trial in a worker process on a maze in shared memory."""
+    from sharedmaze import attach_maze
+    descriptor, config, seed, time_limit = task
+    return trial_score(attach_maze(descriptor), config, seed, time_limit)
+
+
+def evaluate(maze, configs, target_width, batch_size=10, max_seeds=1000,
+             alpha=0.05, seed=0, workers=1, failure_score=None,
+             time_limit=max_time, verbose=True):
+    """
+    Scores the robot configurations on the maze with consecutive seeds, one
+    batch of seeds at a time, until every configuration's confidence interval
+    of the mean score is narrower than target_width, all configurations are
+    statistically separated from each other, or max_seeds seeds were used.
+
+    Checking the intervals after every batch is a repeated test, so the
+    significance level alpha is split evenly over all planned checks and
+    pairwise comparisons (Bonferroni correction). This keeps the overall
+    error rate at most alpha, no matter after which batch the sweep stops.
+
+    Trials in which the robot does not finish within time_limit steps count
+    with failure_score, by default the time limit, which is worse than the
+    score of any finished trial. Leaving them out would make configurations
+    that often fail look better than they are.
+
+    Returns the statistics of every configuration and the reason for
+    stopping. Mazes in which the goal room cannot be reached from the start
+    are not simulated, as no configuration could finish a trial in them;
+    their configurations have no seeds and a mean of None.
+    """
+    looks = int(math.ceil(max_seeds / float(batch_size)))
+    pairs = list(itertools.combinations(range(len(configs)), 2))
+    alpha_look = alpha / looks / max(len(pairs), 1)
+    if failure_score is None:
+        failure_score = time_limit
+
+    stats = [RunningStats() for _ in configs]
+    if not maze.reaches_goal([0, 0]):
+        if verbose:
+            print("Goal room cannot be reached from the start, skipping maze.")
+        return {'reason': 'goal room cannot be reached from the start',
+                'alpha_per_check': alpha_look,
+                'configs': [{'config': format_config(config), 'seeds': 0,
+                             'failures': 0, 'mean': None, 'half_width': None}
+                            for config in configs]}
+
+    pool = None
+    shared_maze = None
+    if workers > 1:
+        # Shared memory requires Python 3.8, which single process runs don't.
+        from sharedmaze import SharedMaze
+        pool = multiprocessing.Pool(workers)
+        shared_maze = SharedMaze(maze)
+    try:
+        reason = 'maximum number of seeds reached'
+        for start in range(seed, seed + max_seeds, batch_size):
+            batch = range(start, min(start + batch_size, seed + max_seeds))
+            for config, config_stats in zip(configs, stats):
+                if pool is not None:
+                    scores = pool.map(pool_trial_score, [
+                        (shared_maze.descriptor, config, trial_seed,
+                         time_limit)
+                        for trial_seed in batch])
+                else:
+                    scores = [trial_score(maze, config, trial_seed,
+                                          time_limit)
+                              for trial_seed in batch]
+                for score in scores:
+                    if score is None:
+                        config_stats.failures += 1
+                        score = failure_score
+                    config_stats.add(score)
+
+            if verbose:
+                print('After {} seeds:'.format(batch[-1] - seed + 1))
+                for config, config_stats in zip(configs, stats):
+                    print('  {:<24} {:8.3f} +/- {:.3f}{}'.format(
+                        format_config(config), config_stats.mean,
+                        config_stats.half_width(alpha_look),
+                        ' ({} failed)'.format(config_stats.failures)
+                        if config_stats.failures else ''))
+
+            if all(2 * s.half_width(alpha_look) < target_width for s in stats):
+                reason = 'confidence intervals narrower than target width'
+                break
+            if pairs and all(separated(stats[i], stats[j], alpha_look)
+                             for i, j in pairs):
+                reason = 'configurations statistically separated'
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            shared_maze.close()
+
+    return {'reason': reason,
+            'alpha_per_check': alpha_look,
+            'configs': [{'config': format_config(config),
+                         'seeds': s.n,
+                         'failures': s.failures,
+                         'mean': s.mean,
+                         'half_width': s.half_width(alpha_look)}
+                        for config, s in zip(configs, stats)]}
+
+
+def format_config(config):
+    return '{}:{}'.format(config['strategy'], config['branch_policy'])
+
+
+if __name__ == '__main__':
+    '''
+    This script scores robot configurations over batches of seeds and stops
+    as soon as the results are conclusive, e.g.
+    python evaluate.py maze_02.txt -c tremaux:random -c tremaux:manhattan
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('maze', help='maze file')
+    parser.add_argument('-c', '--config', action='append', type=parse_config,
+                        help='robot configuration as strategy[:branch_policy],'
+                             ' may be given several times')
+    parser.add_argument('-w', '--width', type=float, default=1.0,
+                        help='target width of the confidence intervals')
+    parser.add_argument('-b', '--batch', type=int, default=10,
+                        help='seeds per batch')
+    parser.add_argument('--max-seeds', type=int, default=1000,
+                        help='maximum number of seeds per configuration')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help='overall significance level')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='first seed of the sweep')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes for the trials')
+    parser.add_argument('--max-time', type=int, default=max_time,
+                        help='time limit of every trial in steps')
+    parser.add_argument('--failure-score', type=float,
+                        help='score of trials in which the robot does not '
+                             'finish in time, defaults to the time limit')
+    args = parser.parse_args()
+
+    maze = Maze(args.maze)
+    if not maze.reaches_goal([0, 0]):
+        parser.exit(1, "Goal room cannot be reached from the start.\n")
+
+    result = evaluate(maze, args.config or [parse_config('tremaux')],
+                      args.width, args.batch, args.max_seeds, args.alpha,
+                      args.seed, args.workers, args.failure_score,
+                      args.max_time)
+    print('Stopped: {}.'.format(result['reason']))
+    for row in result['configs']:
+        print('  {:<24} mean score {:.3f} +/- {:.3f} over {} seeds '
+              '({} failed)'.format(row['config'], row['mean'],
+                                   row['half_width'], row['seeds'],
+                                   row['failures']))
@@ -0,0 +1,77 @@
+import argparse
+import random
+
+import numpy as np
+
+
+def perfect_maze(dim, seed=None, loops=0.0):
+    """
+    Returns the walls of a random maze of the given even dimension, see
+    Maze. The maze is carved by a depth-first search from the start, which
+    makes a perfect maze with long, winding corridors and a single route
+    between any two cells. Afterwards, the given fraction of the remaining
+    inner walls is removed at random, which adds loops.
+    """
+    rng = random.Random(seed)
+    walls = np.zeros((dim, dim), dtype=np.uint8)
+    visited = np.zeros((dim, dim), dtype=bool)
+    # Wall values of the openings in a direction and of the opposite side
+    steps = [(1, 0, 1, 4), (2, 1, 0, 8), (4, 0, -1, 1), (8, -1, 0, 2)]
+
+    visited[0, 0] = True
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        options = [(value, x + dx, y + dy, opposite)
+                   for value, dx, dy, opposite in steps
+                   if 0 <= x + dx < dim and 0 <= y + dy < dim and
+                   not visited[x + dx, y + dy]]
+        if not options:
+            stack.pop()
+            continue
+        value, nx, ny, opposite = rng.choice(options)
+        walls[x, y] |= value
+        walls[nx, ny] |= opposite
+        visited[nx, ny] = True
+        stack.append((nx, ny))
+
+    # A perfect maze has dim * dim - 1 openings out of 2 * dim * (dim - 1)
+    # inner edges.
+    closed = 2 * dim * (dim - 1) - (dim * dim - 1)
+    for _ in range(int(loops * closed)):
+        if rng.random() < 0.5:
+            x, y = rng.randrange(dim - 1), rng.randrange(dim)
+            walls[x, y] |= 2
+            walls[x + 1, y] |= 8
+        else:
+            x, y = rng.randrange(dim), rng.randrange(dim - 1)
+            walls[x, y] |= 1
+            walls[x, y + 1] |= 4
+    return walls
+
+
+def write_maze(filename, walls):
+    """Writes walls to a maze file in the format read by Maze."""
+    with open(filename, 'w') as file_object:
+        file_object.write('{}\n'.format(walls.shape[0]))
+        for row in walls:
+            file_object.write(','.join(str(value) for value in row) + '\n')
+
+
+if __name__ == '__main__':
+    '''
+    This script writes a random maze with long corridors, e.g. for
+    benchmarks on large mazes:
+    python generate.py 128 maze_dfs_128.txt --seed 0
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dim', type=int, help='even maze dimension')
+    parser.add_argument('filename', help='maze file to write')
+    parser.add_argument('--seed', type=int, help='random seed')
+    parser.add_argument('--loops', type=float, default=0.0,
+                        help='fraction of inner walls to remove afterwards')
+    args = parser.parse_args()
+
+    if args.dim % 2:
+        parser.error('the maze dimension must be even')
+    write_maze(args.filename, perfect_maze(args.dim, args.seed, args.loops))
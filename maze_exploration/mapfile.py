@@ -0,0 +1,87 @@
+import hashlib
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+# A map file stores what a robot has learned about a maze, so that another
+# robot can race in it without exploring it first:
+# - Header: magic, format version, maze dimension and the SHA-1 digest of
+#   the uncompressed body, which identifies the map.
+# - Body, zlib compressed: the robot's start position, the sensor readings
+#   it got there at the beginning of the first run, and one byte per cell
+#   holding the cell's wall openings (see Robot.maze_map) in the low nibble
+#   and the code of the cell's racing action (see robot.DIRECTION_CODES) in
+#   the high nibble.
+HEADER = struct.Struct('<4sHI20s')
+MAGIC = b'MZMP'
+VERSION = 1
+START = struct.Struct('<5I')
+
+
+def map_filename(maze_dim, digest):
+    """Returns the default name of a map file, keyed by the maze dimension
+        and the map's digest."""
+    return 'map_{}_{}.mzmap'.format(maze_dim, digest[:12])
+
+
+def save_map(filename, maze_dim, start, start_sensors, maze_map, policy):
+    """
+    Saves a learned maze map and the racing policy, given as an array of
+    action codes, to a map file and returns the file's name. If filename is
+    None, the default name from map_filename() is used.
+    """
+    cells = (np.asarray(maze_map, dtype=np.uint8) |
+             np.asarray(policy, dtype=np.uint8) << 4)
+    body = START.pack(start[0], start[1], *start_sensors) + cells.tobytes()
+    digest = hashlib.sha1(body).hexdigest()
+    if filename is None:
+        filename = map_filename(maze_dim, digest)
+    with open(filename, 'wb') as file_object:
+        file_object.write(HEADER.pack(MAGIC, VERSION, maze_dim,
+                                      bytes.fromhex(digest)))
+        file_object.write(zlib.compress(body))
+    return filename
+
+
+def load_map(filename):
+    """
+    Loads a map file and returns a dictionary with the maze dimension
+    ('dim'), the 'start' position, the 'start_sensors' readings, the
+    'maze_map' and the 'policy' action codes as arrays, and the 'digest'.
+    """
+    with open(filename, 'rb') as file_object:
+        magic, version, maze_dim, digest = HEADER.unpack(
+            file_object.read(HEADER.size))
+        if magic != MAGIC:
+            raise Exception('Not a map file: ' + filename)
+        if version != VERSION:
+            raise Exception('Unsupported map file version {}!'.format(version))
+        body = zlib.decompress(file_object.read())
+
+    if hashlib.sha1(body).digest() != digest:
+        raise Exception('Map file is damaged: ' + filename)
+    start_x, start_y, left, forward, right = START.unpack_from(body)
+    cells = np.frombuffer(body, dtype=np.uint8, offset=START.size).reshape(
+        maze_dim, maze_dim)
+    return {'dim': maze_dim,
+            'start': (start_x, start_y),
+            'start_sensors': [left, forward, right],
+            'maze_map': cells & 15,
+            'policy': cells >> 4,
+            'digest': digest.hex()}
+
+
+if __name__ == '__main__':
+    '''
+    This script prints the header of a map file, e.g.
+    python mapfile.py map_12_0123456789ab.mzmap
+    '''
+    known_map = load_map(sys.argv[1])
+    print('Maze dimension: {}'.format(known_map['dim']))
+    print('Digest: {}'.format(known_map['digest']))
+    print('Start: {}, sensor readings there: {}'.format(
+        known_map['start'], known_map['start_sensors']))
+    print('Racing path length: {} cells'.format(
+        int(np.count_nonzero(known_map['policy']))))
@@ -1,5 +1,519 @@
 import numpy as np
 
+
+# Index of each direction in the sensing table
+SENSING_INDEX = {'u': 0, 'r': 1, 'd': 2, 'l': 3,
+                 'up': 0, 'right': 1, 'down': 2, 'left': 3}
+
+
+# Distance of the nodes which dijkstra() has not reached
+UNREACHED = np.iinfo(np.int64).max
+
+
+def index_dtype(n):
+    """Smallest integer type that can index n cells."""
+    return np.int32 if n < 2 ** 31 else np.int64
+
+
+def connected_components(u, v, n, parent=None):
+    """
+    Labels the connected components of a graph with n nodes and the edges
+    between the nodes u[i] and v[i], using vectorized hooking and pointer
+    jumping. Returns an array which maps every node to a representative
+    node of its component, which ends up being the node with the lowest
+    index in the component.
+
+    Nodes that are already known to be connected can be passed as initial
+    parent array, in which every node points to the lowest node it is
+    connected with.
+    """
+    if parent is None:
+        parent = np.arange(n, dtype=index_dtype(n))
+    while True:
+        # The ends of the edges are representatives after the first round,
+        # whose parents are the current representatives.
+        pu, pv = parent[u], parent[v]
+        crossing = pu != pv
+        if not crossing.any():
+            break
+        # Only edges between different trees are needed in later rounds.
+        u, v = pu[crossing], pv[crossing]
+        # Hook the representative with the higher index of every edge onto
+        # the lower one.
+        high = np.maximum(u, v)
+        parent[high] = np.minimum(u, v)
+        # Shortcut the hooked representatives until they point at the new
+        # representatives.
+        while True:
+            grandparent = parent[parent[high]]
+            moved = parent[high] != grandparent
+            if not moved.any():
+                break
+            parent[high] = grandparent
+            high = high[moved]
+    # Flatten the trees, whose depth is at most the number of rounds.
+    while True:
+        grandparent = parent[parent]
+        if (grandparent == parent).all():
+            return parent
+        parent = grandparent
+
+
+def adjacency(u, n):
+    """
+    Groups the edges of a graph with n nodes by their first node u. Returns
+    the order of the edges and, for every node, the position of its first
+    edge in that order and the number of its edges.
+    """
+    order = np.argsort(u, kind='stable')
+    count = np.bincount(u, minlength=n)
+    return order, np.cumsum(count) - count, count
+
+
+def dijkstra(u, v, weight, n, sources, targets):
+    """
+    Computes the distances from the source nodes of a directed graph with n
+    nodes and the edges from u[i] to v[i] of non-negative integer weight[i]
+    with Dijkstra's algorithm, settling all nodes of the lowest distance at
+    once. The search stops as soon as one of the target nodes is settled.
+    Nodes which have not been reached have the distance UNREACHED.
+    """
+    order, start, count = adjacency(u, n)
+    second, weight = v[order], weight[order]
+    distances = np.full(n, UNREACHED, dtype=np.int64)
+    distances[sources] = 0
+    settled = np.zeros(n, dtype=bool)
+    candidates = np.asarray(sources)
+    while not settled[targets].any():
+        candidates = candidates[~settled[candidates]]
+        if not candidates.size:
+            break
+        distance = distances[candidates].min()
+        nodes = np.unique(candidates[distances[candidates] == distance])
+        settled[nodes] = True
+        # Edges of the settled nodes
+        edges = np.repeat(start[nodes] - np.cumsum(count[nodes]) +
+                          count[nodes], count[nodes])
+        edges += np.arange(edges.size)
+        neighbors = second[edges]
+        new = distance + weight[edges]
+        better = new < distances[neighbors]
+        neighbors, new = neighbors[better], new[better]
+        np.minimum.at(distances, neighbors, new)
+        candidates = np.concatenate([candidates, neighbors])
+    return distances
+
+
+def open_degrees(right, up):
+    """Returns the number of openings of every cell, given the masks of the
+        openings to the right and to the top, see Maze.open_edge_masks()."""
+    degree = right.astype(np.int8) + up
+    degree[1:, :] += right[:-1, :]
+    degree[:, 1:] += up[:, :-1]
+    return degree
+
+
+def label_corridors(right, up, corridor):
+    """
+    Labels the corridors of a maze, given the masks of its openings and of
+    the corridor cells, which have two openings. Like in
+    Maze.label_components(), every corridor cell points at the lowest cell
+    of its vertical run first, which leaves only the openings to the right
+    for connected_components(). Other cells keep their own index.
+    """
+    dim = corridor.shape[0]
+    n = corridor.size
+    joined = np.zeros(corridor.shape, dtype=bool)
+    joined[:, 1:] = up[:, :-1] & corridor[:, :-1] & corridor[:, 1:]
+    index = np.arange(n, dtype=index_dtype(n))
+    parent = np.maximum.accumulate(np.where(joined.ravel(), 0, index))
+    across = np.flatnonzero(right[:-1, :] & corridor[:-1, :] &
+                            corridor[1:, :]).astype(parent.dtype)
+    return connected_components(across, across + dim, n, parent)
+
+
+def race_steps(right, up, start, goal):
+    """
+    Returns the smallest number of moves from the start cell to one of the
+    goal cells through the openings given by the masks, where a move covers
+    up to three cells in a straight line, like the moves of the robot, or
+    None if no goal cell can be reached.
+
+    The corridors, chains of cells with two openings, are split into
+    straight runs. Crossing a corridor costs the moves of its runs, except
+    that a move may continue straight through the cells at its ends. The
+    other cells are searched with dijkstra() in states of a cell, the
+    direction of the last move and the cells which are left of it.
+    """
+    dim = right.shape[0]
+    n = dim * dim
+    terminals = [start] + list(goal)
+    degree = open_degrees(right, up)
+    corridor = degree == 2
+    corridor.ravel()[terminals] = False
+    node = (degree > 0) & ~corridor
+    node.ravel()[terminals] = True
+    labels = label_corridors(right, up, corridor)
+    node = node.ravel()
+    x, y = np.indices((dim, dim), dtype=index_dtype(n))
+
+    # Every straight run of openings between two cells which are no straight
+    # corridor cells, with the directions up, right, down, left as 0 to 3.
+    runs = []
+    for is_open, coordinate, step, direction in [(right, x, dim, 1),
+                                                 (up, y, 1, 0)]:
+        axis = 0 if step == dim else 1
+        before = np.zeros((dim, dim), dtype=bool)
+        if axis == 0:
+            before[1:, :] = is_open[:-1, :]
+        else:
+            before[:, 1:] = is_open[:, :-1]
+        through = corridor & is_open & before
+        first = np.maximum.accumulate(np.where(through, 0, coordinate),
+                                      axis=axis)
+        run = (first * dim + y) if axis == 0 else (x * dim + first)
+        length = np.bincount(run[is_open], minlength=n)
+        p = np.flatnonzero(is_open & ~through)
+        length = length[p].astype(np.int64)
+        runs.append((p, p + length * step, length, np.full(p.size, direction)))
+
+    # Corridor of every run, from a corridor cell at its ends or inside it.
+    # Runs between two other cells are corridors of their own.
+    p, q, length, direction = [np.concatenate(parts) for parts in zip(*runs)]
+    p_node, q_node = node[p], node[q]
+    inside = np.minimum(p + np.where(direction == 1, dim, 1), n - 1)
+    chain = np.where(~p_node, labels[p], np.where(
+        ~q_node, labels[q], np.where(length > 1, labels[inside],
+                                     n + np.arange(p.size))))
+    # Moves of the runs between two turns of a corridor
+    between = ~p_node & ~q_node
+    inner = np.bincount(chain[between], (length[between] + 2) // 3,
+                        n + p.size).astype(np.int64)
+
+    # Both ends of every corridor: the cell, the direction leading into the
+    # corridor and the length of the run there
+    end_chain = np.concatenate([chain[p_node], chain[q_node]])
+    end_cell = np.concatenate([p[p_node], q[q_node]])
+    end_direction = np.concatenate([direction[p_node],
+                                    direction[q_node] + 2])
+    end_length = np.concatenate([length[p_node], length[q_node]])
+    straight = np.concatenate([q_node[p_node], p_node[q_node]])
+    order = np.argsort(end_chain, kind='stable')
+    pairs = [order[::2], order[1::2]]
+
+    # States of the nodes: state 0 without a move to continue, and states
+    # 1 + direction * 2 + cells left - 1 with one or two cells left of a
+    # move in a direction, from which the robot can always stop for free.
+    index = np.cumsum(node) - 1
+    nodes = int(index[-1]) + 1
+    state = np.arange(nodes, dtype=np.int64) * 9
+    source = [np.repeat(state, 8) + np.tile(np.arange(1, 9), nodes)]
+    target = [np.repeat(state, 8)]
+    cost = [np.zeros(nodes * 8, dtype=np.int64)]
+
+    # Crossing every corridor in both directions, starting with zero to two
+    # cells left of a move into the corridor.
+    carry = np.arange(3)[:, None]
+    for a, b in [pairs, pairs[::-1]]:
+        steps_in = (np.maximum(end_length[a] - carry, 0) + 2) // 3
+        through_left = np.where(end_length[a] <= carry, carry - end_length[a],
+                                -(end_length[a] - carry) % 3)
+        crossing = np.where(straight[a], steps_in, steps_in +
+                            inner[end_chain[a]] + (end_length[b] + 2) // 3)
+        left = np.where(straight[a], through_left, -end_length[b] % 3)
+        source.append(state[index[end_cell[a]]] + np.where(
+            carry > 0, 1 + end_direction[a] % 4 * 2 + carry - 1, 0))
+        target.append(state[index[end_cell[b]]] + np.where(
+            left > 0, 1 + (end_direction[b] + 2) % 4 * 2 + left - 1, 0))
+        cost.append(crossing)
+    source, target, cost = [np.concatenate([part.ravel() for part in parts])
+                            for parts in [source, target, cost]]
+
+    targets = state[index[goal]]
+    distances = dijkstra(source, target, cost, nodes * 9,
+                         [state[index[start]]], targets)
+    distance = distances[targets].min()
+    return None if distance == UNREACHED else int(distance)
+
+
+def shortest_path(u, v, weight, n, source, target):
+    """
+    Finds a shortest path between the source and the target node of a graph
+    with n nodes and the edges between the nodes u[i] and v[i] of positive
+    integer weight[i]. Returns a boolean array which marks the edges on the
+    path, or None if the target cannot be reached.
+
+    A breadth-first search needs one round of array operations per distance,
+    which is slow for mazes with long paths. Instead, the graph is contracted
+    first, see PathContraction, and only the remaining graph is searched.
+    """
+    contraction = PathContraction(u, v, weight, n, source, target)
+    contraction.contract()
+    return contraction.search()
+
+
+class PathContraction(object):
+    """
+    Contracts a graph while preserving the shortest paths between a source
+    and a target node, which takes a few rounds even for mazes with long,
+    winding corridors:
+    - Rake: other nodes with only one edge are dead ends and are removed.
+    - Compress: chains of other nodes with two edges, i.e. corridors, are
+      replaced by single edges weighted with the chains' lengths.
+    A perfect maze contracts to a single edge between source and target,
+    mazes with loops to the graph of their junctions on loops.
+
+    Every edge that is replaced or removed is linked to the edge replacing
+    it, or to no edge, so that the original edges of a path in the
+    contracted graph can be found afterwards.
+    """
+
+    def __init__(self, u, v, weight, n, source, target):
+        self.a, self.b = u, v
+        self.weight = weight
+        self.edges = u.size
+        self.ids = np.arange(self.edges, dtype=index_dtype(2 * self.edges + 1))
+        self.next_id = self.edges
+        self.links = []
+        self.source, self.target = source, target
+        self.terminal = np.zeros(n, dtype=bool)
+        self.terminal[[source, target]] = True
+
+    def remove(self, removed, replacement=-1):
+        """Removes the edges in the boolean mask and links them to their
+            replacement edges."""
+        self.links.append((self.ids[removed], replacement))
+        keep = ~removed
+        self.a, self.b = self.a[keep], self.b[keep]
+        self.weight, self.ids = self.weight[keep], self.ids[keep]
+
+    def degrees(self):
+        size = self.terminal.size
+        return (np.bincount(self.a, minlength=size) +
+                np.bincount(self.b, minlength=size))
+
+    def rake(self):
+        """Removes the dead ends and returns true if there were any."""
+        leaf = (self.degrees() == 1) & ~self.terminal
+        dead = leaf[self.a] | leaf[self.b]
+        if not dead.any():
+            return False
+        self.remove(dead)
+        return True
+
+    def compress(self):
+        """Replaces the chains by weighted edges and returns true if there
+            were any."""
+        chain = (self.degrees() == 2) & ~self.terminal
+        in_a, in_b = chain[self.a], chain[self.b]
+        members = in_a | in_b
+        if not members.any():
+            return False
+        inner = in_a & in_b
+        labels = connected_components(self.a[inner], self.b[inner],
+                                      chain.size)
+        # Chain of every edge that has a node in a chain
+        member_chain = labels[np.where(in_a, self.a, self.b)[members]]
+        length = np.bincount(member_chain, self.weight[members], chain.size)
+        # A chain has two edges to other nodes, unless it is a closed loop
+        # without any. Sorting them by chain pairs the ends of the chains.
+        boundary = (in_a ^ in_b)[members]
+        outer = np.where(in_a, self.b, self.a)[members][boundary]
+        order = np.argsort(member_chain[boundary], kind='stable')
+        chains = member_chain[boundary][order[::2]]
+        ids = np.full(chain.size, -1, dtype=self.ids.dtype)
+        ids[chains] = self.next_id + np.arange(chains.size, dtype=ids.dtype)
+
+        self.remove(members, ids[member_chain])
+        self.a = np.concatenate([self.a, outer[order[::2]]])
+        self.b = np.concatenate([self.b, outer[order[1::2]]])
+        self.weight = np.concatenate([self.weight,
+                                      length[chains].astype(self.weight.dtype)])
+        self.ids = np.concatenate([self.ids, ids[chains]])
+        self.next_id += chains.size
+        return True
+
+    def renumber(self):
+        """Numbers the nodes which are left consecutively."""
+        alive = self.terminal.copy()
+        alive[self.a] = True
+        alive[self.b] = True
+        index = np.cumsum(alive, dtype=index_dtype(alive.size)) - 1
+        self.a, self.b = index[self.a], index[self.b]
+        self.source = int(index[self.source])
+        self.target = int(index[self.target])
+        self.terminal = self.terminal[alive]
+
+    def contract(self):
+        """
+        Rakes and compresses the graph until nothing changes anymore, or a
+        round removes less than a quarter of the edges, which happens for
+        the junctions of mazes with many loops.
+        """
+        self.renumber()
+        while True:
+            edges = self.a.size
+            loops = self.a == self.b
+            if loops.any():
+                self.remove(loops)
+            changed = self.rake()
+            changed = self.compress() or changed
+            self.renumber()
+            if not changed or self.a.size > edges * 3 // 4:
+                break
+
+    def search(self):
+        """
+        Finds a shortest path in the contracted graph with dijkstra() and
+        returns the original edges on it, see shortest_path().
+        """
+        size = self.terminal.size
+        # Both directions of all edges
+        first = np.concatenate([self.a, self.b])
+        second = np.concatenate([self.b, self.a])
+        weight = np.concatenate([self.weight, self.weight])
+        distances = dijkstra(first, second, weight, size, [self.source],
+                             [self.target])
+        if distances[self.target] == UNREACHED:
+            return None
+
+        order, start, count = adjacency(first, size)
+        second, weight = second[order], weight[order]
+        ids = np.concatenate([self.ids, self.ids])[order]
+        # Follow the path back from the target. Every tentative distance
+        # belongs to an existing path, which decreases along the way.
+        path = []
+        node = self.target
+        while node != self.source:
+            edges = slice(start[node], start[node] + count[node])
+            step = np.flatnonzero(distances[second[edges]] + weight[edges] ==
+                                  distances[node])[0] + start[node]
+            path.append(ids[step])
+            node = second[step]
+        return self.original_edges(path)
+
+    def original_edges(self, ids):
+        """Returns a boolean array which marks the original edges replaced
+            by the given edges of the contracted graph."""
+        removed = self.next_id
+        link = np.arange(removed + 1, dtype=self.ids.dtype)
+        for ids_removed, replacement in self.links:
+            link[ids_removed] = replacement
+        link[link < 0] = removed
+        while True:
+            grandparent = link[link]
+            if (grandparent == link).all():
+                break
+            link = grandparent
+        marked = np.zeros(removed + 1, dtype=bool)
+        marked[ids] = True
+        marked[removed] = False
+        return marked[link[:self.edges]]
+
+
+class CorridorGraph(object):
+    """
+    Graph of a maze in which every corridor, a chain of cells with two
+    openings, is contracted into a single edge between the cells at its
+    ends, weighted with the number of openings along it. The other cells
+    and the given terminal cells stay nodes, indexed like the maze's cells,
+    and the openings between them stay edges of weight one, listed first.
+
+    The corridor labels of the maze, see Maze.corridor_labels, can be given
+    to save labelling the corridors again. Only the corridors through the
+    terminal cells, which split them, are labelled anew then.
+    """
+
+    def __init__(self, right, up, terminals, labels=None):
+        dim = right.shape[0]
+        n = dim * dim
+        dtype = index_dtype(n)
+        self.dim, self.n = dim, n
+        corridor = open_degrees(right, up) == 2
+        if labels is None:
+            corridor.ravel()[terminals] = False
+            labels = label_corridors(right, up, corridor)
+        else:
+            split = labels[terminals][corridor.ravel()[terminals]]
+            corridor.ravel()[terminals] = False
+            if split.size:
+                # The few cells of these corridors are labelled on their own.
+                pieces = np.isin(labels, split) & corridor.ravel()
+                cells = np.flatnonzero(pieces).astype(dtype)
+                links = [(cells[right.ravel()[cells] & pieces[
+                              np.minimum(cells + dim, n - 1)]], dim),
+                         (cells[up.ravel()[cells] & pieces[
+                              np.minimum(cells + 1, n - 1)]], 1)]
+                u = np.concatenate([link for link, _ in links])
+                v = np.concatenate([link + offset for link, offset in links])
+                parts = connected_components(np.searchsorted(cells, u),
+                                             np.searchsorted(cells, v),
+                                             cells.size)
+                labels = labels.copy()
+                labels[cells] = cells[parts]
+                labels[terminals] = terminals
+        self.labels = labels
+
+        # Openings between cells outside of corridors, with the openings to
+        # the right listed first
+        steps = [(right[:-1, :], corridor[:-1, :], corridor[1:, :], dim),
+                 (up[:, :-1], corridor[:, :-1], corridor[:, 1:], 1)]
+        u, v, ends, outer = [], [], [], []
+        for is_open, here, there, offset in steps:
+            cells = np.zeros((dim, dim), dtype=bool)
+            cells[:is_open.shape[0], :is_open.shape[1]] = (
+                is_open & ~here & ~there)
+            cells = np.flatnonzero(cells).astype(dtype)
+            u.append(cells)
+            v.append(cells + offset)
+            # Openings between a corridor and another cell
+            for end_mask, sign in [(here & ~there, 1), (there & ~here, -1)]:
+                cells = np.zeros((dim, dim), dtype=bool)
+                cells[:is_open.shape[0], :is_open.shape[1]] = (
+                    is_open & end_mask)
+                cells = np.flatnonzero(cells).astype(dtype)
+                if sign < 0:
+                    cells += offset
+                ends.append(cells)
+                outer.append(cells + sign * offset)
+        self.direct = sum(cells.size for cells in u)
+        ends = self.labels[np.concatenate(ends)]
+        outer = np.concatenate(outer)
+
+        # Every corridor becomes an edge between the cells at its two ends.
+        # Corridors which are closed loops have no ends and are left out.
+        first = np.full(n, n, dtype=dtype)
+        np.minimum.at(first, ends, outer)
+        second = np.full(n, -1, dtype=dtype)
+        np.maximum.at(second, ends, outer)
+        self.chains = np.flatnonzero(second >= 0).astype(dtype)
+        length = np.bincount(self.labels[corridor.ravel()],
+                             minlength=n)[self.chains]
+        self.a = np.concatenate(u + [first[self.chains]])
+        self.b = np.concatenate(v + [second[self.chains]])
+        self.weight = np.concatenate([np.ones(self.direct, dtype),
+                                      (length + 1).astype(dtype)])
+
+    def merged(self, cells):
+        """Returns the ends of the edges, where all given cells are replaced
+            by the first one, e.g. to search a path to any of them."""
+        a, b = self.a.copy(), self.b.copy()
+        for cell in cells[1:]:
+            a[a == cell] = cells[0]
+            b[b == cell] = cells[0]
+        return a, b
+
+    def cells(self, edges):
+        """Returns the mask of the maze's cells on the edges given as a
+            boolean array, the ends of the edges and their corridors."""
+        on_chain = np.zeros(self.n, dtype=bool)
+        on_chain[self.chains[edges[self.direct:]]] = True
+        cells = on_chain[self.labels].reshape(self.dim, self.dim)
+        cells.ravel()[self.a[edges]] = True
+        cells.ravel()[self.b[edges]] = True
+        return cells
+
+
 class Maze(object):
     def __init__(self, filename):
         '''
@@ -20,12 +534,40 @@ class Maze(object):
             self.dim = int(next(f_in))
 
             # Subsequent lines describe the permissability of walls
-            walls = []
-            for line in f_in:
-                walls.append(list(map(int,line.split(','))))
-            self.walls = np.array(walls)
+            self.walls = np.loadtxt(f_in, delimiter=',', dtype=int, ndmin=2)
+
+        self.validate()
+
+        # Results of the connectivity analysis and sensing table,
+        # computed on first use.
+        self._edge_masks = None
+        self._labels = None
+        self._corridor_labels = None
+        self._goal_distances = None
+        self._goal_path = None
+        self._race_steps = None
+        self._sensing_table = None
 
-        # Perform validation on maze
+    @classmethod
+    def from_walls(cls, walls, validate=True):
+        """Creates a maze from an array of wall values, see __init__. The
+            consistency checks can be skipped for walls known to be valid."""
+        maze = cls.__new__(cls)
+        maze.walls = np.asarray(walls)
+        maze.dim = maze.walls.shape[0]
+        if validate:
+            maze.validate()
+        maze._edge_masks = None
+        maze._labels = None
+        maze._corridor_labels = None
+        maze._goal_distances = None
+        maze._goal_path = None
+        maze._race_steps = None
+        maze._sensing_table = None
+        return maze
+
+    def validate(self):
+        """Performs consistency checks on the maze dimensions and walls."""
         # Maze dimensions
         if self.dim % 2:
             raise Exception('Maze dimensions must be even in length!')
@@ -35,15 +577,13 @@ class Maze(object):
         # Wall permeability
         wall_errors = []
         # vertical walls
-        for x in range(self.dim-1):
-            for y in range(self.dim):
-                if (self.walls[x,y] & 2 != 0) != (self.walls[x+1,y] & 8 != 0):
-                    wall_errors.append([(x,y), 'v'])
+        vertical = ((self.walls[:-1, :] & 2) != 0) != ((self.walls[1:, :] & 8) != 0)
+        for x, y in zip(*np.nonzero(vertical)):
+            wall_errors.append([(int(x), int(y)), 'v'])
         # horizontal walls
-        for y in range(self.dim-1):
-            for x in range(self.dim):
-                if (self.walls[x,y] & 1 != 0) != (self.walls[x,y+1] & 4 != 0):
-                    wall_errors.append([(x,y), 'h'])
+        horizontal = ((self.walls[:, :-1] & 1) != 0) != ((self.walls[:, 1:] & 4) != 0)
+        for y, x in zip(*np.nonzero(horizontal.T)):
+            wall_errors.append([(int(x), int(y)), 'h'])
 
         if wall_errors:
             for cell, wall_type in wall_errors:
@@ -78,6 +618,9 @@ class Maze(object):
         may be input as a single letter 'u', 'r', 'd', 'l', or complete words
         'up', 'right', 'down', 'left'.
         """
+        if self._sensing_table is not None:
+            return int(self._sensing_table[SENSING_INDEX[direction]][tuple(cell)])
+
         dir_move = {'u': [0, 1], 'r': [1, 0], 'd': [0, -1], 'l': [-1, 0],
                     'up': [0, 1], 'right': [1, 0], 'down': [0, -1], 'left': [-1, 0]}
 
@@ -91,4 +634,330 @@ class Maze(object):
                 curr_cell[1] += dir_move[direction][1]
             else:
                 sensing = False
-        return distance
\ No newline at end of file
+        return distance
+
+    @property
+    def sensing_table(self):
+        """
+        Distances to the nearest wall from every cell in the directions up,
+        right, down and left, as an array of shape (4, dim, dim). Once the
+        table has been computed, dist_to_wall() looks distances up in it.
+        """
+        if self._sensing_table is None:
+            self._sensing_table = self.compute_sensing_table()
+        return self._sensing_table
+
+    def compute_sensing_table(self):
+        """Computes the sensing table from the positions of the closest walls
+            along every row and column, see sensing_table."""
+        dim = self.dim
+        x, y = np.indices((dim, dim))
+        table = np.empty((4, dim, dim), dtype=index_dtype(dim))
+        # Position of the closest wall at or above/right of every cell
+        wall_up = np.where((self.walls & 1) == 0, y, dim - 1)
+        table[0] = np.minimum.accumulate(wall_up[:, ::-1], axis=1)[:, ::-1] - y
+        wall_right = np.where((self.walls & 2) == 0, x, dim - 1)
+        table[1] = np.minimum.accumulate(wall_right[::-1, :], axis=0)[::-1, :] - x
+        # Position of the closest wall at or below/left of every cell
+        wall_down = np.where((self.walls & 4) == 0, y, 0)
+        table[2] = y - np.maximum.accumulate(wall_down, axis=1)
+        wall_left = np.where((self.walls & 8) == 0, x, 0)
+        table[3] = x - np.maximum.accumulate(wall_left, axis=0)
+        return table
+
+    def open_edges(self):
+        """
+        Returns two arrays of flat cell indices (x * dim + y), where the cells
+        at the same position are connected by an open edge. Openings to the
+        right are listed before openings to the top.
+        """
+        right, up = self.open_edge_masks()
+        dtype = index_dtype(self.dim * self.dim)
+        right = np.flatnonzero(right).astype(dtype)
+        up = np.flatnonzero(up).astype(dtype)
+        return (np.concatenate([right, up]),
+                np.concatenate([right + self.dim, up + 1]))
+
+    def open_edge_masks(self):
+        """Returns boolean arrays of the cells with openings to the right and
+            to the top, not counting openings in the outer walls. The masks
+            are computed once, every call returns copies of them."""
+        if self._edge_masks is None:
+            right = (self.walls & 2) != 0
+            right[-1, :] = False
+            up = (self.walls & 1) != 0
+            up[:, -1] = False
+            self._edge_masks = right, up
+        right, up = self._edge_masks
+        return right.copy(), up.copy()
+
+    @property
+    def labels(self):
+        """
+        Connected component labels of all cells, as an array of the same shape
+        as walls. Two cells have the same label if, and only if, there is a
+        path between them.
+        """
+        if self._labels is None:
+            self._labels = self.label_components()
+        return self._labels
+
+    @property
+    def corridor_labels(self):
+        """
+        Corridor labels of all cells as a flat array, see label_corridors().
+        All cells of a corridor, a chain of cells with two openings, have the
+        label of its lowest cell, other cells have their own index.
+        """
+        if self._corridor_labels is None:
+            right, up = self.open_edge_masks()
+            self._corridor_labels = label_corridors(
+                right, up, open_degrees(right, up) == 2)
+        return self._corridor_labels
+
+    def label_components(self):
+        """
+        Labels the connected components of the maze, see labels. Cells
+        connected along their column are labelled in one pass first, which
+        leaves only the openings to the right for connected_components().
+
+        If most cells are corridors, they are labelled by corridor first,
+        see corridor_labels, which the corridor contractions reuse, and only
+        the openings at the ends of the corridors are left.
+        """
+        n = self.dim * self.dim
+        right, up = self.open_edge_masks()
+        if self.mostly_corridors():
+            corridor = open_degrees(right, up) == 2
+            right[:-1, :] &= ~(corridor[:-1, :] & corridor[1:, :])
+            up[:, :-1] &= ~(corridor[:, :-1] & corridor[:, 1:])
+            parent = self.corridor_labels.copy()
+            right = np.flatnonzero(right).astype(parent.dtype)
+            up = np.flatnonzero(up).astype(parent.dtype)
+            return connected_components(
+                np.concatenate([right, up]),
+                np.concatenate([right + self.dim, up + 1]), n,
+                parent).reshape(self.dim, self.dim)
+        # Cells which are open to the cell below them
+        joined = np.zeros(n, dtype=bool)
+        joined[np.flatnonzero(up) + 1] = True
+        # Every cell points at the lowest cell of its vertical run.
+        index = np.arange(n, dtype=index_dtype(n))
+        parent = np.maximum.accumulate(np.where(joined, 0, index))
+        right = np.flatnonzero(right).astype(parent.dtype)
+        return connected_components(right, right + self.dim, n,
+                                    parent).reshape(self.dim, self.dim)
+
+    def reachable(self, a, b):
+        """Returns true if there is a path between the cells a and b.
+            Cells are input as lists."""
+        return self.labels[tuple(a)] == self.labels[tuple(b)]
+
+    def reaches_goal(self, cell):
+        """Returns true if the goal room can be reached from the cell, which
+            is input as a list."""
+        return any(self.reachable(cell, goal) for goal in self.goal_room)
+
+    @property
+    def goal_room(self):
+        """The center cells which make up the goal room."""
+        half = self.dim // 2
+        return [[half - 1, half - 1], [half - 1, half],
+                [half, half - 1], [half, half]]
+
+    @property
+    def goal_distances(self):
+        """
+        Length of the shortest path from every cell to the goal room, as an
+        array of the same shape as walls. Cells from which the goal room
+        cannot be reached have a distance of -1.
+        """
+        if self._goal_distances is None:
+            self._goal_distances = self.distances_from(self.goal_room)
+        return self._goal_distances
+
+    def distances_from(self, cells, max_step=1, until=None):
+        """
+        Computes the shortest path lengths from the given cells to every
+        other cell with a breadth-first search that expands the complete
+        frontier in every iteration. With a max_step above 1, a move may
+        cover up to max_step open cells in a straight line, like the moves of
+        the robot, and the distances count moves instead of cells.
+
+        The search stops early once the cell until has been reached. Cells
+        that have not been reached by then have a distance of -1, like
+        unreachable ones.
+        """
+        dim = self.dim
+        n = dim * dim
+        dtype = index_dtype(n)
+        # Flat index offsets of the moves and the cells they can start from,
+        # for the directions up, right, down and left. The sensing table
+        # excludes openings in the outer walls. Moves of one cell only need
+        # the openings, which are cheaper to get.
+        offsets = [1, dim, -1, -dim]
+        if max_step == 1:
+            right, up = self.open_edge_masks()
+            down = np.zeros_like(up)
+            down[:, 1:] = up[:, :-1]
+            left = np.zeros_like(right)
+            left[1:, :] = right[:-1, :]
+            steps = list(zip(offsets, [is_open.ravel() for is_open in
+                                       [up, right, down, left]]))
+        else:
+            table = self.sensing_table.reshape(4, n)
+            steps = [(length * offset, table[index] >= length)
+                     for index, offset in enumerate(offsets)
+                     for length in range(1, max_step + 1)]
+
+        distances = np.full(n, -1, dtype=dtype)
+        frontier = np.unique(np.array([cx * dim + cy for cx, cy in cells],
+                                      dtype=dtype))
+        distances[frontier] = 0
+        # Used to drop cells that were reached from several frontier cells
+        slot = np.empty(n, dtype=dtype)
+        stop = None if until is None else until[0] * dim + until[1]
+        distance = 0
+        while frontier.size:
+            if stop is not None and distances[stop] >= 0:
+                break
+            distance += 1
+            neighbors = np.concatenate([frontier[is_open[frontier]] + offset
+                                        for offset, is_open in steps])
+            neighbors = neighbors[distances[neighbors] < 0]
+            distances[neighbors] = distance
+            order = np.arange(neighbors.size, dtype=dtype)
+            slot[neighbors] = order
+            frontier = neighbors[slot[neighbors] == order]
+        return distances.reshape(dim, dim)
+
+    @property
+    def goal_path(self):
+        """
+        A shortest path from the start to the goal room, given as the masks
+        of the cells whose openings to the right and to the top are on the
+        path, see open_edge_masks(), or None if the goal room cannot be
+        reached from the start.
+        """
+        if self._goal_path is None and self.reaches_goal([0, 0]):
+            self._goal_path = self.find_goal_path()
+        return self._goal_path
+
+    def find_goal_path(self):
+        """
+        Finds a shortest path to the goal room, see goal_path.
+
+        If most cells are corridors, chains of cells with two openings, as
+        in mazes with long, winding paths, the path is found by
+        contract_goal_path(). Otherwise, contracting the corridors saves
+        little, and a breadth-first search from the goal room is faster;
+        where several shortest paths branch off, going straight is then
+        preferred.
+        """
+        dim = self.dim
+        if self.mostly_corridors():
+            return self.contract_goal_path()
+
+        distances = self.distances_from(self.goal_room, until=[0, 0])
+
+        right = np.zeros((dim, dim), dtype=bool)
+        up = np.zeros((dim, dim), dtype=bool)
+        steps = [(1, 0, 1), (2, 1, 0), (4, 0, -1), (8, -1, 0)]
+        x, y = 0, 0
+        heading = None
+        while distances[x, y] > 0:
+            options = [(dx, dy) for value, dx, dy in steps
+                       if (self.walls[x, y] & value and
+                           0 <= x + dx < dim and 0 <= y + dy < dim and
+                           distances[x + dx, y + dy] == distances[x, y] - 1)]
+            heading = heading if heading in options else options[0]
+            dx, dy = heading
+            if dx:
+                right[min(x, x + dx), y] = True
+            else:
+                up[x, min(y, y + dy)] = True
+            x, y = x + dx, y + dy
+        return right, up
+
+    def contract_goal_path(self):
+        """
+        Finds a shortest path to the goal room, see goal_path. The corridors
+        of the maze are contracted into weighted edges first, see
+        CorridorGraph, and the graph of the remaining cells is passed to
+        shortest_path().
+        """
+        goal = [x * self.dim + y for x, y in self.goal_room]
+        right, up = self.component_edge_masks([0, 0])
+        graph = CorridorGraph(right, up, [0] + goal, self.corridor_labels)
+        a, b = graph.merged(goal)
+        on_path = shortest_path(a, b, graph.weight, graph.n, 0, goal[0])
+        # Openings between two cells on a shortest path are on the path.
+        cells = graph.cells(on_path)
+        right[:-1, :] &= cells[:-1, :] & cells[1:, :]
+        up[:, :-1] &= cells[:, :-1] & cells[:, 1:]
+        return right, up
+
+    def component_edge_masks(self, cell):
+        """Returns the masks of the openings like open_edge_masks(), but
+            only of the connected component of the given cell."""
+        inside = self.labels == self.labels[cell[0], cell[1]]
+        right, up = self.open_edge_masks()
+        return right & inside, up & inside
+
+    def mostly_corridors(self):
+        """Returns true if most cells of the maze are corridor cells with two
+            openings, as in mazes with long, winding paths."""
+        degree = open_degrees(*self.open_edge_masks())
+        return np.count_nonzero(degree == 2) * 2 > degree.size
+
+    def contract_race_steps(self):
+        """
+        Computes optimal_race_steps. Dead ends are never part of a race, so
+        they are removed by contracting the corridor graph with
+        PathContraction first, and race_steps() only searches the cells
+        which are left.
+        """
+        goal = [x * self.dim + y for x, y in self.goal_room]
+        right, up = self.component_edge_masks([0, 0])
+        graph = CorridorGraph(right, up, [0] + goal, self.corridor_labels)
+        a, b = graph.merged(goal)
+        contraction = PathContraction(a, b, graph.weight, graph.n, 0, goal[0])
+        contraction.contract()
+        cells = graph.cells(contraction.original_edges(contraction.ids))
+        right[:-1, :] &= cells[:-1, :] & cells[1:, :]
+        up[:, :-1] &= cells[:, :-1] & cells[:, 1:]
+        return race_steps(right, up, 0, goal)
+
+    @property
+    def shortest_distance_to_goal(self):
+        """Length of the shortest path from the start to the goal room, or
+            None if the goal room cannot be reached from the start."""
+        path = self.goal_path
+        if path is None:
+            return None
+        right, up = path
+        return int(np.count_nonzero(right) + np.count_nonzero(up))
+
+    @property
+    def optimal_race_steps(self):
+        """
+        Smallest number of time steps in which the robot can get from the
+        start to the goal room, moving up to three cells per step, or None if
+        the goal room cannot be reached. This is the best possible race of a
+        trial, so it can be compared with the robot's race steps.
+        """
+        if self._race_steps is None and self.reaches_goal([0, 0]):
+            self._race_steps = self.find_race_steps()
+        return self._race_steps
+
+    def find_race_steps(self):
+        """
+        Computes optimal_race_steps. Like in find_goal_path(), mazes which
+        are mostly corridors are contracted, see contract_race_steps(), and
+        other mazes are searched breadth-first from the goal room until the
+        start is reached.
+        """
+        if self.mostly_corridors():
+            return self.contract_race_steps()
+        return int(self.distances_from(self.goal_room, max_step=3,
+                                       until=[0, 0])[0, 0])
@@ -0,0 +1,276 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Layout of a binary path log:
+# - Header: magic, format version and record size.
+# - Records: one fixed-size record per logged step.
+# - Index: one entry per phase boundary, holding the name of the phase and
+#   the number of the record at which it begins.
+# - Trailer: number of records, number of index entries and a second magic.
+#   It is always located at the end of the file, so that the index can be
+#   found without reading the records.
+HEADER = struct.Struct('<4sHH')
+HEADER_MAGIC = b'MZPL'
+INDEX_ENTRY = struct.Struct('<16sQ')
+TRAILER = struct.Struct('<QI4s')
+TRAILER_MAGIC = b'MZPI'
+VERSION = 1
+
+RECORD = np.dtype([('x', '<u2'), ('y', '<u2'), ('value', 'u1'),
+                   ('heading', 'u1')])
+
+HEADINGS = ['up', 'right', 'down', 'left']
+HEADING_CODES = {heading: code for code, heading in enumerate(HEADINGS)}
+
+# Cell value of the racing path, see Robot.SHORTEST
+SHORTEST = 3
+
+
+class PathLogWriter(object):
+    """
+    Writes a binary path log. Records are buffered and written together
+    with the index every flush_every records, when the position is taken
+    and on close(), so the file is complete and readable up to the last of
+    these points at any time while it is written.
+    """
+
+    def __init__(self, filename, position=None, flush_every=4096):
+        self.filename = filename
+        self.flush_every = flush_every
+        # Records which have not been written yet
+        self.pending = bytearray()
+        self.pending_count = 0
+        if position is None:
+            self.file_object = open(filename, 'w+b')
+            self.file_object.write(HEADER.pack(HEADER_MAGIC, VERSION,
+                                               RECORD.itemsize))
+            self.count = 0
+            self.phases = []
+        else:
+            # Continue an existing log, dropping everything after position.
+            self.file_object = open(filename, 'r+b')
+            self.count = position['count']
+            self.phases = [tuple(phase) for phase in position['phases']]
+        self.flush()
+        self.file_object.truncate()
+
+    def append(self, x, y, value, heading):
+        """Appends one step of the path to the log."""
+        self.pending += struct.pack('<HHBB', x, y, value,
+                                    HEADING_CODES[heading])
+        self.pending_count += 1
+        if self.pending_count >= self.flush_every:
+            self.flush()
+
+    def mark(self, phase):
+        """Marks the beginning of a phase at the next record."""
+        self.phases.append((phase, self.count + self.pending_count))
+
+    def flush(self):
+        """Writes the pending records, followed by the index."""
+        self.file_object.seek(HEADER.size + self.count * RECORD.itemsize)
+        self.file_object.write(self.pending)
+        self.count += self.pending_count
+        self.pending = bytearray()
+        self.pending_count = 0
+        for phase, index in self.phases:
+            self.file_object.write(INDEX_ENTRY.pack(phase.encode('ascii'),
+                                                    index))
+        self.file_object.write(TRAILER.pack(self.count, len(self.phases),
+                                            TRAILER_MAGIC))
+        self.file_object.flush()
+
+    def position(self):
+        """Returns the current position in the log, see __init__. The log is
+            written up to the position first."""
+        self.flush()
+        return {'count': self.count, 'phases': [list(p) for p in self.phases]}
+
+    def close(self):
+        if not self.file_object.closed:
+            self.flush()
+            self.file_object.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonPathLogWriter(object):
+    """Writes a path log in the line-delimited JSON format."""
+
+    def __init__(self, filename, position=None):
+        self.filename = filename
+        if position is None:
+            # This clears an existing log file.
+            open(self.filename, 'w').close()
+        else:
+            # Continue an existing log, dropping everything after position.
+            with open(self.filename, 'r+') as file_object:
+                file_object.truncate(position['offset'])
+
+    def append(self, x, y, value, heading):
+        """Appends one step of the path to the log."""
+        with open(self.filename, 'a') as file_object:
+            # Data format: [Robot-X, Robot-Y, Current Cell Value, Robot-Heading]
+            json.dump([x, y, value, heading], file_object)
+            file_object.write('\n')
+
+    def mark(self, phase):
+        """Phase boundaries are not stored in JSON logs."""
+        pass
+
+    def flush(self):
+        """Every step is written right away."""
+        pass
+
+    def position(self):
+        """Returns the current position in the log, see __init__."""
+        return {'offset': os.path.getsize(self.filename)}
+
+    def close(self):
+        pass
+
+
+def open_path_log(filename, position=None):
+    """
+    Returns a writer for a path log, binary if the filename ends in .bin.
+    If a position returned by a writer's position() is given, the writer
+    continues the existing log at that position.
+    """
+    if filename.endswith('.bin'):
+        return PathLogWriter(filename, position)
+    return JsonPathLogWriter(filename, position)
+
+
+class PathLog(object):
+    """
+    Read-only, memory-mapped view of a binary path log.
+
+    Indexing and slicing return records as a numpy structured array with the
+    fields x, y, value and heading (as code, see HEADINGS) without parsing or
+    copying the file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file_object:
+            self.mmap = mmap.mmap(file_object.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+
+        magic, version, record_size = HEADER.unpack_from(self.mmap, 0)
+        if magic != HEADER_MAGIC:
+            raise Exception('Not a binary path log: ' + filename)
+        if version != VERSION or record_size != RECORD.itemsize:
+            raise Exception('Unsupported path log version {}!'.format(version))
+
+        count, entries, magic = TRAILER.unpack_from(
+            self.mmap, len(self.mmap) - TRAILER.size)
+        if magic != TRAILER_MAGIC:
+            raise Exception('Path log index is missing or damaged!')
+
+        self.records = np.frombuffer(self.mmap, dtype=RECORD, count=count,
+                                     offset=HEADER.size)
+        index_offset = HEADER.size + count * RECORD.itemsize
+        self.phases = []
+        for i in range(entries):
+            phase, index = INDEX_ENTRY.unpack_from(
+                self.mmap, index_offset + i * INDEX_ENTRY.size)
+            self.phases.append((phase.rstrip(b'\0').decode('ascii'), index))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def phase(self, name):
+        """Returns the records from the beginning of the named phase to the
+            beginning of the next phase."""
+        for i, (phase, start) in enumerate(self.phases):
+            if phase == name:
+                if i + 1 < len(self.phases):
+                    return self.records[start:self.phases[i + 1][1]]
+                return self.records[start:]
+        raise KeyError(name)
+
+    def steps(self, start=0, stop=None):
+        """Yields the records in the given range as
+            [x, y, value, heading] lists, like the JSON log format."""
+        for x, y, value, heading in self.records[start:stop].tolist():
+            yield [x, y, value, HEADINGS[heading]]
+
+    def close(self):
+        self.records = None
+        try:
+            self.mmap.close()
+        except BufferError:
+            # Records sliced from the log are still in use, the map is
+            # released once they are gone.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_path(filename, start=0, stop=None):
+    """Yields the steps of a path log in the given range as
+        [x, y, value, heading] lists, from either log format."""
+    if filename.endswith('.bin'):
+        with PathLog(filename) as path_log:
+            for step in path_log.steps(start, stop):
+                yield step
+    else:
+        with open(filename, 'r') as file_object:
+            for i, line in enumerate(file_object):
+                if stop is not None and i >= stop:
+                    break
+                if i >= start:
+                    yield json.loads(line)
+
+
+def json_to_binary(json_filename, bin_filename):
+    """
+    Converts a JSON path log to the binary format. As JSON logs have no phase
+    index, the racing phase is recognized by the first cell marked as part of
+    the shortest path.
+    """
+    with PathLogWriter(bin_filename) as writer:
+        writer.mark('explore')
+        racing = False
+        for x, y, value, heading in read_path(json_filename):
+            if value == SHORTEST and not racing:
+                writer.mark('race')
+                racing = True
+            writer.append(x, y, value, heading)
+
+
+def binary_to_json(bin_filename, json_filename):
+    """Converts a binary path log to the JSON format."""
+    with open(json_filename, 'w') as file_object:
+        for step in read_path(bin_filename):
+            json.dump(step, file_object)
+            file_object.write('\n')
+
+
+if __name__ == '__main__':
+    '''
+    This script converts a path log between the JSON and the binary format.
+    The direction is determined by the file extension of the arguments, e.g.
+    python pathlog.py path.json path.bin
+    '''
+    source, destination = sys.argv[1], sys.argv[2]
+    if destination.endswith('.bin'):
+        json_to_binary(source, destination)
+    else:
+        binary_to_json(source, destination)
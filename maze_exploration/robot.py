@@ -1,10 +1,65 @@
 # coding: utf8
-import json
+import heapq
 import random
 from sys import stderr
 
 import numpy as np
 
+from mapfile import load_map
+from mapfile import save_map
+from pathlog import open_path_log
+from strategies import get_strategy
+from tiles import CodedGrid
+from tiles import TiledCells
+
+
+def goal_distance(robot, x, y):
+    """Manhattan distance from a cell to the closest cell of the goal room."""
+    half = robot.maze_dim // 2
+    dx = max(half - 1 - x, 0, x - half)
+    dy = max(half - 1 - y, 0, y - half)
+    return dx + dy
+
+
+def goal_turns(robot, x, y, heading):
+    """Number of turns needed to reach the goal room from a cell with the
+        given heading, if there were no walls in the way."""
+    half = robot.maze_dim // 2
+    # Offset to the closest cell of the goal room
+    dx = min(max(half - 1, x), half) - x
+    dy = min(max(half - 1, y), half) - y
+    hx, hy = robot.direction_to_vec[heading]
+    ahead = dx * hx + dy * hy
+    aside = dx * hy - dy * hx
+    if ahead > 0 or (ahead == 0 and aside == 0):
+        return 0 if aside == 0 else 1
+    return 1 if ahead == 0 else 2
+
+
+# Branch ordering policies. Each policy returns a sort key for a path leading
+# in a local direction ('left', 'forward' or 'right') to the cell (x, y),
+# paths with lower keys are explored first. Equal keys are ordered randomly.
+BRANCH_POLICIES = {
+    # Explore the branches in random order.
+    'random': lambda robot, direction, x, y: 0,
+    # Prefer branches that lead closer to the goal room.
+    'manhattan': lambda robot, direction, x, y: goal_distance(robot, x, y),
+    # Prefer branches on which the goal room could be reached with the
+    # fewest turns, counting the turn into the branch, then the ones leading
+    # closer to it.
+    'fewest_turns': lambda robot, direction, x, y: (
+        (direction != 'forward') +
+        goal_turns(robot, x, y, robot.local_to_global(direction)),
+        goal_distance(robot, x, y)),
+    # Prefer going straight over turning.
+    'straight': lambda robot, direction, x, y: direction != 'forward',
+}
+
+
+# Codes of the directions and the goal marker ('*') stored in the
+# path and policy grids, used to store these grids as numbers.
+DIRECTION_CODES = ['', 'up', 'right', 'down', 'left', '*']
+
 
 class Robot(object):
     class Cell(object):
@@ -16,18 +71,44 @@ class Robot(object):
             # Indicates if the cell is unvisited, visited or double visited.
             self.value = 0  # type: int
 
-    def __init__(self, maze_dim):
+    def __init__(self, maze_dim, strategy='tremaux', log_filename='path.json',
+                 verbose=True, start=(0, 0), shared_map=None,
+                 branch_policy='random', seed=None, map_file=None,
+                 storage=None):
         """
         Set up attributes that the agent will use to learn and navigate the
         maze. Some initial attributes are
         provided based on common information, including the size of the maze
         the robot is placed in.
+
+        The exploration strategy is looked up by name in the strategy
+        registry, see strategies.py. The path is logged in the binary format
+        of pathlog.py if log_filename ends in '.bin', as JSON lines otherwise.
+        Path logging can be disabled by passing None as log_filename.
+
+        Several robots can explore the same maze together by passing them
+        the same shared_map, see cooperative.py. Their maze and path maps
+        are then taken from the shared map instead of being private.
+
+        The branch_policy decides in which order the robot explores the
+        unvisited branches of a junction, see BRANCH_POLICIES. Runs with
+        the same seed make the same random decisions.
+
+        If a map_file saved by save_known_map() is given, the robot skips
+        the exploration and races to the goal room in both runs, provided
+        that its first sensor readings match the ones recorded in the map
+        file. Otherwise, it discards the map and explores the maze. While
+        racing, the robot replans whenever its sensors disagree with the map,
+        see replan_race().
+
+        The robot's maps are nested lists, unless a TileStorage is given,
+        which keeps them in tiled files with a bounded cache, see tiles.py.
         """
 
         # Initialize coordinate values
-        self.orig_x, self.orig_y = 0, 0
-        self.x, self.y = 0, 0
-        self.last_x, self.last_y = 0, 0
+        self.orig_x, self.orig_y = start
+        self.x, self.y = start
+        self.last_x, self.last_y = start
 
         # Maximum allowed movement units per turn
         self.max_movement = 3
@@ -40,6 +121,14 @@ class Robot(object):
         # Members to store the external inputs in
         self.maze_dim = maze_dim
         self.sensors = []
+        # Storage of the maps, see new_grid()
+        self.storage = storage
+        # Sensor readings at the beginning of the first run, which identify
+        # the maze when warm starting from a map file.
+        self.start_sensors = None
+        # Sensor readings expected at the beginning of the first run,
+        # recorded in the loaded map file.
+        self.known_sensors = None
 
         # Flag that indicates the first step of exploration
         self.is_beginning = True
@@ -52,12 +141,20 @@ class Robot(object):
 
         # The robot's current mode of operation.
         # This decides what the robot does when next_move() is called.
+        # In "stopped" mode, after the race found no way to the goal room,
+        # the robot stays where it is.
         self.mode = "explore"
 
-        # Text file in which the travelled path will be logged.
-        self.log_filename = 'path.json'
-        # This clears an existing log file.
-        open(self.log_filename, 'w').close()
+        # Print status messages to stdout
+        self.verbose = verbose
+
+        # File in which the travelled path will be logged.
+        self.log_filename = log_filename
+        self.path_log = None
+        if self.log_filename is not None:
+            # This clears an existing log file.
+            self.path_log = open_path_log(self.log_filename)
+            self.path_log.mark('explore')
 
         # Corresponding new headings after rotating
         self.dict_rotation = {'up': ['left', 'right'],
@@ -102,16 +199,20 @@ class Robot(object):
         # with walls on top and bottom (0*1 + 1*2 + 0*4 + 1*8 = 10).
         # The index origin (0, 0) is at the bottom left. The first index is the offset right from the origin,
         # the second index is the offset up from the origin.
-        self.maze_map = [[0 for _ in range(maze_dim)] for _ in range(maze_dim)]
+        self.maze_map = self.new_grid('maze_map')
 
         # Internal path map for the robot to keep track of the already visited parts of the maze.
-        self.path_map = [[self.Cell() for _ in range(maze_dim)] for _ in
-                         range(maze_dim)]
+        self.path_map = self.new_path_map()
+
+        # Map shared with other robots exploring the same maze
+        self.shared_map = shared_map
+        if shared_map is not None:
+            self.maze_map = shared_map.maze_map
+            self.path_map = shared_map.path_map
 
         # Policy grid which will be created after fully exploring the maze and
         # performing a search algorithm.
-        self.policy_grid = [['' for _ in range(self.maze_dim)] for _ in
-                            range(self.maze_dim)]
+        self.policy_grid = self.new_policy_grid()
 
         # Possible cell values
         # These are used to mark and log the robot's path.
@@ -120,6 +221,59 @@ class Robot(object):
         self.DOUBLE_VISITED = 2
         self.SHORTEST = 3
 
+        # Order in which unvisited branches of a junction are explored
+        if branch_policy not in BRANCH_POLICIES:
+            raise ValueError("Unknown branch policy '{}', available policies: "
+                             "{}".format(branch_policy,
+                                         ', '.join(sorted(BRANCH_POLICIES))))
+        self.branch_policy = branch_policy
+        # Source of all random decisions of the robot
+        self.random = random.Random(seed)
+
+        # Exploration strategy which decides every move in "explore" mode.
+        strategy_class = get_strategy(strategy)
+        if storage is not None and not strategy_class.tiled:
+            raise ValueError("The '{}' strategy keeps maze-sized arrays in "
+                             "memory and cannot be used with tiled "
+                             "storage".format(strategy))
+        self.strategy = strategy_class(self)
+
+        if map_file is not None:
+            self.load_known_map(map_file)
+
+    def new_grid(self, name, values=None):
+        """
+        Returns a new maze-sized grid of small numbers, indexed as grid[x][y]
+        and filled from an array of values or with zeros. Without storage,
+        the grid is a nested list, otherwise a tiled grid of the storage
+        under the given name, which replaces a former grid of that name.
+        """
+        if self.storage is not None:
+            return self.storage.grid(name, self.maze_dim, values)
+        if values is not None:
+            return np.asarray(values).tolist()
+        return [[0 for _ in range(self.maze_dim)] for _ in range(self.maze_dim)]
+
+    def new_path_map(self):
+        """Returns a new path map of unvisited cells, see new_grid()."""
+        if self.storage is not None:
+            return TiledCells(self.new_grid('path_values'),
+                              self.new_grid('path_previous'), DIRECTION_CODES)
+        return [[self.Cell() for _ in range(self.maze_dim)] for _ in
+                range(self.maze_dim)]
+
+    def new_policy_grid(self, codes=None):
+        """Returns a new policy grid, filled from an array of action codes
+            (see DIRECTION_CODES) or without actions, see new_grid()."""
+        if self.storage is not None:
+            return CodedGrid(self.new_grid('policy_grid', codes),
+                             DIRECTION_CODES)
+        if codes is None:
+            return [['' for _ in range(self.maze_dim)] for _ in
+                    range(self.maze_dim)]
+        return [[DIRECTION_CODES[code] for code in column]
+                for column in np.asarray(codes).tolist()]
+
     def next_move(self, sensors):
         """
         Determines the next move the robot should make,
@@ -145,6 +299,13 @@ class Robot(object):
         self.rotation = 0
         self.movement = 0
         self.sensors = sensors
+        if self.start_sensors is None:
+            self.start_sensors = list(sensors)
+
+        if self.mode == "warmstart":
+            # A map of the maze has been loaded. Race right away if it
+            # belongs to this maze, explore the maze otherwise.
+            self.check_known_map()
 
         if self.mode == "explore":
             # Explore and map the complete maze iteratively on
@@ -162,9 +323,9 @@ class Robot(object):
             # the maze map in memory.
             # A searching algorithm can now be used with the internal
             # map to find the shortest path.
-            # This is completed in just one call.
-            self.find_shortest_path()
-            self.switch_to_race()
+            # This is completed in just one call. After a warm start, the
+            # policy is already known.
+            self.start_race()
 
         elif self.mode == "race":
             # Race to the goal room on the shortest path through the maze.
@@ -200,10 +361,11 @@ class Robot(object):
         return open_directions
 
     def get_paths(self, open_directions, value):
-        """Returns the directions where there are paths with the specified value.
-            Only checks in the provided directions."""
+        """Returns the directions where there are paths with the specified value,
+            ordered by the robot's branch policy. Only checks in the provided directions."""
         # Direction vector pointing in the direction of the robot's heading.
         movement_vec = np.array(self.direction_to_vec[self.heading])
+        policy = BRANCH_POLICIES[self.branch_policy]
 
         paths = []
         for direction in open_directions:
@@ -216,9 +378,19 @@ class Robot(object):
             if (not (next_loc[0], next_loc[1]) == (
             self.last_x, self.last_y) and
                     self.path_is(value, next_loc[0], next_loc[1])):
-                paths.append(direction)
+                paths.append((policy(self, direction, next_loc[0], next_loc[1]),
+                              self.random.random(), direction))
 
-        return paths
+        return [direction for _, _, direction in sorted(paths)]
+
+    def local_to_global(self, direction):
+        """Translates a direction relative to the robot's heading
+            ('left', 'forward' or 'right') into a global direction."""
+        if direction == 'left':
+            return self.dict_rotation[self.heading][0]
+        elif direction == 'right':
+            return self.dict_rotation[self.heading][1]
+        return self.heading
 
     def mark_path(self, new_value=None):
         """Mark a traveled path by increasing its value in the path map."""
@@ -318,25 +490,51 @@ class Robot(object):
 
     def end_exploration(self):
         """Stop the robot's exploration mode and reset the run."""
-        print("Robot has reached the origin again. Finishing exploration.")
+        if self.verbose:
+            print("Robot has reached the origin again. Finishing exploration.")
         # Reset some localization-specific values
         self.heading = "up"
         self.x, self.y = self.orig_x, self.orig_y
 
         self.mode = "search"
+        self.mark_phase('reset')
 
         # Set the reset signals
         self.movement = "Reset"
         self.rotation = "Reset"
 
+    def end_race(self):
+        """Stop racing in the first run after a warm start and reset the
+            run, to race again in the second run. Like at the end of the
+            exploration, the path is prepared along with the reset, so the
+            second run starts racing with its first move."""
+        if self.verbose:
+            print("Robot has reached the goal room. Racing again.")
+        self.heading = "up"
+        self.x, self.y = self.orig_x, self.orig_y
+
+        self.mark_phase('reset')
+        self.start_race()
+
+        self.movement = "Reset"
+        self.rotation = "Reset"
+
     def log_location(self):
-        """Stores current coordinates in a log file."""
-        with open(self.log_filename, 'a') as file_object:
-            # Data format: [Robot-X, Robot-Y, Current Cell Value, Robot-Heading]
-            out_data = [self.x, self.y, self.path_map[self.x][self.y].value,
-                        self.heading]
-            json.dump(out_data, file_object)
-            file_object.write('\n')
+        """Stores current coordinates in the path log."""
+        if self.path_log is None:
+            return
+        self.path_log.append(self.x, self.y,
+                             self.path_map[self.x][self.y].value, self.heading)
+
+    def close_log(self):
+        """Writes the rest of the path log and closes it."""
+        if self.path_log is not None:
+            self.path_log.close()
+
+    def mark_phase(self, phase):
+        """Marks the beginning of a new phase in the path log."""
+        if self.path_log is not None:
+            self.path_log.mark(phase)
 
     def update_map(self, open_directions):
         """Update the robot's internal map using the unblocked (open)
@@ -346,13 +544,7 @@ class Robot(object):
 
         # First, translate the detected openings into global directions
         for direction in open_directions:
-            global_dir = None
-            if direction == 'left':
-                global_dir = self.dict_rotation[self.heading][0]
-            elif direction == 'right':
-                global_dir = self.dict_rotation[self.heading][1]
-            elif direction == 'forward':
-                global_dir = self.heading
+            global_dir = self.local_to_global(direction)
 
             # Get the corresponding wall value for an wall opening in the given direction
             wall_value = self.wall_values[global_dir]
@@ -368,91 +560,14 @@ class Robot(object):
                 self.y + dir_vec[1]] |= wall_value
 
     def explore(self):
-        """Explore a maze using Trémaux' algorithm."""
-
-        if self.is_beginning:
-            # This prevents the robot from immediately cancelling exploration
-            self.is_beginning = False
-        elif self.finished_exploration():
-            # When back at the start, end the exploration
-            self.end_exploration()
-            self.mark_path()
-            return
+        """Perform one exploration step using the robot's strategy."""
+        self.strategy.explore()
 
-        # When in reversing mode, just finish the rotation and move forward
-        if self.is_reversing:
-            self.rotation = 90
-            self.movement = 1
-            self.is_reversing = False
-            return
-
-        # Translate sensor readings into unblocked directions
-        open_directions = self.check_open_directions()
-        # Update the internal mapping of the maze
-        self.update_map(open_directions)
-
-        # --------------------------------------
-        # Trémaux' algorithm
-        # --------------------------------------
-
-        if len(open_directions) == 0:
-            # Robot is at a deadend
-            # Start backtracking
-            self.reverse()
-            self.mark_path(self.DOUBLE_VISITED)
-
-        elif len(open_directions) == 1:
-            # Robot is on a path to the next junction
-            self.follow_path(open_directions.pop())
-            self.mark_path()
-
-        elif len(open_directions) > 1:
-            # Robot is at a junction
-            if self.path_is(self.UNVISITED):
-                # Robot is at a new junction
-                # Store the direction to the path which has led to this junction, used for backtracking.
-                self.path_map[self.x][self.y].previous = self.opposite[
-                    self.heading]
-                # Get the adjacent paths that are still unvisited.
-                unvisited_paths = self.get_paths(open_directions, self.UNVISITED)
-                if len(unvisited_paths) > 0:
-                    # There are still unvisited paths branching from this junction, follow a random one.
-                    self.follow_path(random.choice(unvisited_paths))
-                    # Mark this junction for the first time
-                    self.mark_path()
-                else:
-                    # This junction has no unvisited paths left,
-                    # treat it like a dead end.
-                    self.reverse()
-                    self.mark_path(self.DOUBLE_VISITED)
-
-            elif self.path_is(self.VISITED):
-                # Robot is at an old junction
-                if self.path_is(self.DOUBLE_VISITED, self.last_x, self.last_y):
-                    # Robot is backtracking
-                    unvisited_paths = self.get_paths(open_directions, self.UNVISITED)
-                    if len(unvisited_paths) > 0:
-                        # There is still at least one unvisited path branching from this junction
-                        # Follow a random one of them.
-                        self.follow_path(random.choice(unvisited_paths))
-                    else:
-                        # There are no unvisited paths branching from this junction.
-                        # Continue backtracking.
-                        self.continue_backtracking()
-                        # Mark this junction for the second time
-                        self.mark_path()
-                else:
-                    # Robot has stepped into an old junction while not backtracking,
-                    # so treat it like a deadend.
-                    self.reverse()
-            else:
-                print("The junction at position " + str((self.x, self.y)) +
-                      " has no valid value.", file=stderr)
-
-    def find_shortest_path(self):
-        """Find the shortest path to the goal using breadth-first search and
-            create an action policy from it."""
-        init = [self.orig_x, self.orig_y]
+    def find_shortest_path(self, start=None):
+        """Find the shortest path from the start, by default the origin, to
+            the goal using breadth-first search and create an action policy
+            from it. Returns false if the map has no path to the goal."""
+        init = [self.orig_x, self.orig_y] if start is None else list(start)
 
         # The center cells which make up the goal room.
         goal_room = [[self.maze_dim / 2, self.maze_dim / 2],
@@ -463,32 +578,28 @@ class Robot(object):
         # This could be used to change the movement costs.
         cost = 1
 
-        # Connects movement delta vectors and
-        # their corresponding directional actions.
-        delta_to_action = {(0, 1): 'up',
-                           (1, 0): 'right',
-                           (0, -1): 'down',
-                           (-1, 0): 'left'}
+        # Connects directional actions and their codes in the action grid.
+        action_codes = {name: code for code, name in enumerate(DIRECTION_CODES)}
 
-        # This grid holds the action delta at every position of the maze.
-        delta_grid = [[(0, 0) for _ in range(self.maze_dim)] for _ in
-                      range(self.maze_dim)]
+        # This grid holds the code of the action that leads into every
+        # visited position of the maze, except for the start. Unvisited
+        # positions have the code 0.
+        action_grid = self.new_grid('search')
 
         # Initialize some values and lists for the search algorithm
         g = 0
-        open_cells = [[g, init[0], init[1]]]
-        visited = [init]
+        open_cells = [(g, init[0], init[1])]
         end = []
 
-        # Search through the maze with Dijkstra.
+        # Search through the maze with Dijkstra, keeping the open list as a
+        # heap.
         while True:
 
             if not open_cells:
                 break
 
-            open_cells.sort()
             # Get the cell from the open list with the lowest cost-value (G-Value).
-            g, x, y = open_cells.pop(0)
+            g, x, y = heapq.heappop(open_cells)
 
             if [x, y] in goal_room:
                 # Stop when entering the goal room.
@@ -496,34 +607,38 @@ class Robot(object):
                 break
 
             # Check the current position in the maze map for wall openings.
-            # For every wall opening, the corresponding directional delta vector is added
-            # to the deltas list. This essentially creates a list of deltas to cells connected to
-            # the current cell in the map.
-            deltas = []
+            # For every wall opening, the corresponding direction is added
+            # to the directions list. This essentially creates a list of the
+            # directions to cells connected to the current cell in the map.
+            directions = []
             for direction, value in self.wall_values.items():
                 if self.maze_map[x][y] & value != 0:
-                    deltas.append(self.direction_to_vec[direction])
+                    directions.append(direction)
 
             # Now, loop through all the connected cells
-            for dx, dy in deltas:
-                # Use delta to calculate the coords of the next cell (nx, ny)
+            for direction in directions:
+                # Use the direction's delta to calculate the coords of the next cell (nx, ny)
+                dx, dy = self.direction_to_vec[direction]
                 nx, ny = x + dx, y + dy
-                if [nx, ny] not in visited:
+                if not action_grid[nx][ny] and [nx, ny] != init:
                     # The next cell is not yet visited
-                    open_cells.append([g + cost, nx, ny])
-                    visited.append([nx, ny])
-                    # Save the action delta vector needed to get to this next cell (nx, ny)
-                    delta_grid[nx][ny] = (dx, dy)
+                    heapq.heappush(open_cells, (g + cost, nx, ny))
+                    # Save the action needed to get to this next cell (nx, ny)
+                    action_grid[nx][ny] = action_codes[direction]
+
+        if not end:
+            return False
 
         # Create policy path by travelling from end to start
         x, y = end
         self.policy_grid[x][y] = '*'
         while [x, y] != init:
-            # Apply the previously saved action deltas backwards.
-            nx = x - delta_grid[x][y][0]
-            ny = y - delta_grid[x][y][1]
+            # Apply the previously saved actions backwards.
+            action = DIRECTION_CODES[action_grid[x][y]]
+            nx = x - self.direction_to_vec[action][0]
+            ny = y - self.direction_to_vec[action][1]
             # Save the action string to the policy grid.
-            self.policy_grid[nx][ny] = delta_to_action[delta_grid[x][y]]
+            self.policy_grid[nx][ny] = action
             # Continue with the next position
             x, y = nx, ny
 
@@ -534,16 +649,36 @@ class Robot(object):
             #     for x in range(self.maze_dim):
             #         print("{:>7}".format(self.policy_grid[x][y]), end="")
             #     print("]")
+        return True
+
+    def start_race(self):
+        """Searches the shortest path from the start position, unless the
+            policy already leads from there, and switches to racing mode."""
+        if not self.policy_grid[self.orig_x][self.orig_y]:
+            self.find_shortest_path()
+        self.switch_to_race()
 
     def switch_to_race(self):
         """Switches to racing mode and performs one-time actions for the switch."""
         # This is needed to mark the beginning of the race path.
+        self.mark_phase('race')
         self.mark_path(self.SHORTEST)
         self.log_location()
         self.mode = "race"
 
     def race_to_goal(self):
         """Travel the shortest path to the goal room."""
+        if self.contradicted_walls() and not self.replan_race():
+            if self.verbose:
+                print("No known way to the goal room left. Stopping.")
+            self.mode = "stopped"
+            return
+
+        if self.policy_grid[self.x][self.y] == '*':
+            # The goal room is only reached in race mode during the first
+            # run after a warm start, as the trial ends in the second run.
+            self.end_race()
+            return
 
         # First, collect up to three actions in a line if they are the same
         actions = []
@@ -567,7 +702,201 @@ class Robot(object):
                 else:
                     abort = True
 
+        if actions[0] == self.opposite[self.heading]:
+            # A path replanned on the way may lead back, turn around first.
+            self.rotation = 90
+            self.movement = 0
+            return
+
         # Secondly, set rotation and movement according to the collected actions
         self.rotation = self.direction_to_rotation[self.heading].get(
             actions[0], 0)
         self.movement = len(actions)
+
+    def contradicted_walls(self):
+        """
+        Returns the walls that the sensors see where the maze map has an
+        opening, as a list of the global direction of the wall and the cell
+        in front of it. The map only lacks openings the robot has not seen
+        yet, so such a wall means that the map does not belong to the maze.
+        """
+        walls = []
+        for sensor, direction in zip(self.sensors, ['left', 'forward', 'right']):
+            global_dir = self.local_to_global(direction)
+            value = self.wall_values[global_dir]
+            dx, dy = self.direction_to_vec[global_dir]
+            x, y = self.x, self.y
+            distance = 0
+            # Follow the map's openings up to the sensed wall
+            while distance < sensor and self.maze_map[x][y] & value:
+                x, y = x + dx, y + dy
+                distance += 1
+            if distance == sensor and self.maze_map[x][y] & value:
+                walls.append((global_dir, x, y))
+        return walls
+
+    def replan_race(self):
+        """
+        Closes the openings of the maze map that the sensors contradict and
+        searches a new racing path from the current cell, so that the robot
+        does not race into walls when the maze differs from a loaded map
+        file. Returns false if the map has no way to the goal room left.
+        """
+        if self.verbose:
+            print("Sensors contradict the maze map. Searching a new path.")
+        for global_dir, x, y in self.contradicted_walls():
+            self.maze_map[x][y] &= 15 ^ self.wall_values[global_dir]
+            dx, dy = self.direction_to_vec[global_dir]
+            if 0 <= x + dx < self.maze_dim and 0 <= y + dy < self.maze_dim:
+                self.maze_map[x + dx][y + dy] &= 15 ^ self.wall_values[
+                    self.opposite[global_dir]]
+        self.update_map(self.check_open_directions())
+        self.policy_grid = self.new_policy_grid()
+        return self.find_shortest_path((self.x, self.y))
+
+    def save_known_map(self, filename=None):
+        """
+        Saves the learned maze map and the racing policy to a map file, from
+        which a new robot can warm start, see mapfile.py. Returns the file's
+        name, which by default is derived from the maze dimension and the
+        map's digest.
+        """
+        codes = {name: code for code, name in enumerate(DIRECTION_CODES)}
+        return save_map(filename, self.maze_dim, (self.orig_x, self.orig_y),
+                        self.start_sensors, self.maze_map,
+                        [[codes[action] for action in column]
+                         for column in self.policy_grid])
+
+    def load_known_map(self, filename):
+        """Loads a map file saved by save_known_map(), to race without
+            exploring if it matches the maze, see check_known_map()."""
+        known_map = load_map(filename)
+        if known_map['dim'] != self.maze_dim:
+            raise ValueError('Map file {} is for a maze of dimension {}, not '
+                             '{}'.format(filename, known_map['dim'],
+                                         self.maze_dim))
+        if known_map['start'] != (self.orig_x, self.orig_y):
+            # The policy leads from a different start, so the map is useless.
+            if self.verbose:
+                print("Map file has a different start position, ignoring it.")
+            return
+        self.maze_map = self.new_grid('maze_map', known_map['maze_map'])
+        self.policy_grid = self.new_policy_grid(known_map['policy'])
+        self.known_sensors = known_map['start_sensors']
+        self.mode = "warmstart"
+
+    def check_known_map(self):
+        """
+        Starts racing if the first sensor readings equal the ones recorded in
+        the loaded map file, otherwise discards the map and the policy and
+        starts exploring the maze.
+        """
+        if self.sensors == self.known_sensors:
+            if self.verbose:
+                print("Loaded map matches the maze. Skipping exploration.")
+            self.switch_to_race()
+            return
+
+        if self.verbose:
+            print("Loaded map does not match the maze. Exploring it.")
+        self.maze_map = self.new_grid('maze_map')
+        self.policy_grid = self.new_policy_grid()
+        self.mode = "explore"
+
+    def get_state(self):
+        """
+        Returns the complete state of the robot as a pair of a dictionary of
+        plain values and a dictionary of numpy arrays, see set_state(). The
+        maps of a robot with tiled storage would have to be copied into
+        maze-sized arrays, so its state cannot be taken.
+        """
+        if self.storage is not None:
+            raise ValueError('The state of a robot with tiled storage cannot '
+                             'be saved')
+        codes = {name: code for code, name in enumerate(DIRECTION_CODES)}
+        rng_version, rng_state, rng_gauss = self.random.getstate()
+        values = {
+            'maze_dim': self.maze_dim,
+            'strategy': self.strategy.name,
+            'branch_policy': self.branch_policy,
+            'verbose': self.verbose,
+            'log_filename': self.log_filename,
+            'log_position': (self.path_log.position()
+                             if self.path_log is not None else None),
+            'orig': [self.orig_x, self.orig_y],
+            'location': [self.x, self.y],
+            'last_location': [self.last_x, self.last_y],
+            'heading': self.heading,
+            'mode': self.mode,
+            'is_beginning': self.is_beginning,
+            'is_reversing': self.is_reversing,
+            'rotation': self.rotation,
+            'movement': self.movement,
+            'sensors': list(self.sensors),
+            'start_sensors': self.start_sensors,
+            'known_sensors': self.known_sensors,
+            'rng_version': rng_version,
+            'rng_gauss': rng_gauss}
+        arrays = {
+            'maze_map': np.array(self.maze_map, dtype=np.uint8),
+            'path_values': np.array([[cell.value for cell in column]
+                                     for column in self.path_map],
+                                    dtype=np.uint8),
+            'path_previous': np.array([[codes[cell.previous] for cell in column]
+                                       for column in self.path_map],
+                                      dtype=np.uint8),
+            'policy_grid': np.array([[codes[action] for action in column]
+                                     for column in self.policy_grid],
+                                    dtype=np.uint8),
+            'rng_state': np.array(rng_state, dtype=np.uint32)}
+
+        strategy_values, strategy_arrays = self.strategy.get_state()
+        values['strategy_state'] = strategy_values
+        for name, array in strategy_arrays.items():
+            arrays['strategy_' + name] = array
+        return values, arrays
+
+    @classmethod
+    def from_state(cls, values, arrays):
+        """Creates a robot from a state returned by get_state(). The robot
+            continues the path log from where the state was taken."""
+        robot = cls(values['maze_dim'], strategy=values['strategy'],
+                    log_filename=None, verbose=values['verbose'],
+                    start=tuple(values['orig']),
+                    branch_policy=values['branch_policy'])
+        robot.set_state(values, arrays)
+        return robot
+
+    def set_state(self, values, arrays):
+        """Restores the state returned by get_state()."""
+        self.x, self.y = values['location']
+        self.last_x, self.last_y = values['last_location']
+        self.heading = values['heading']
+        self.mode = values['mode']
+        self.is_beginning = values['is_beginning']
+        self.is_reversing = values['is_reversing']
+        self.rotation = values['rotation']
+        self.movement = values['movement']
+        self.sensors = values['sensors']
+        self.start_sensors = values.get('start_sensors')
+        self.known_sensors = values.get('known_sensors')
+        self.random.setstate((values['rng_version'],
+                              tuple(int(n) for n in arrays['rng_state']),
+                              values['rng_gauss']))
+
+        self.maze_map = self.new_grid('maze_map', arrays['maze_map'])
+        for x, column in enumerate(self.path_map):
+            for y, cell in enumerate(column):
+                cell.value = int(arrays['path_values'][x, y])
+                cell.previous = DIRECTION_CODES[arrays['path_previous'][x, y]]
+        self.policy_grid = self.new_policy_grid(arrays['policy_grid'])
+
+        self.strategy.set_state(values['strategy_state'],
+                                {name[len('strategy_'):]: array
+                                 for name, array in arrays.items()
+                                 if name.startswith('strategy_')})
+
+        self.log_filename = values['log_filename']
+        if self.log_filename is not None:
+            self.path_log = open_path_log(self.log_filename,
+                                          values['log_position'])
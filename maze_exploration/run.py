@@ -1,11 +1,16 @@
-import json
+import argparse
 import sys
 import turtle
 
+from checkpoint import load_checkpoint
+from checkpoint import save_checkpoint
 from maze import Maze
 from robot import Robot
 from showmaze import draw_maze
 from showmaze import draw_path
+from strategies import get_strategy
+from tiles import TiledMaze
+from tiles import TileStorage
 
 # global dictionaries for robot movement and sensing
 dir_sensors = {'u': ['l', 'u', 'r'], 'r': ['u', 'r', 'd'],
@@ -21,105 +26,256 @@ dir_reverse = {'u': 'd', 'r': 'l', 'd': 'u', 'l': 'r',
 max_time = 1000
 train_score_mult = 1 / 30.
 
-if __name__ == '__main__':
-    '''
-    This script tests an agent implementation based on the code in robot.py 
-    on a maze given as an argument when running the script.
-    '''
 
-    # Create a maze based on input argument on command line.
-    maze = Maze(str(sys.argv[1]))
+def sense(maze, robot_pos):
+    """Returns the distances to the walls left, in front and right of the robot."""
+    return [maze.dist_to_wall(robot_pos['location'], heading)
+            for heading in dir_sensors[robot_pos['heading']]]
+
+
+def apply_move(maze, robot_pos, rotation, movement, verbose=True):
+    """Performs a rotation and movement of the robot inside the maze."""
+    # perform rotation
+    if rotation == -90:
+        robot_pos['heading'] = dir_sensors[robot_pos['heading']][0]
+    elif rotation == 90:
+        robot_pos['heading'] = dir_sensors[robot_pos['heading']][2]
+    elif rotation == 0:
+        pass
+    elif verbose:
+        print("Invalid rotation value, no rotation performed.")
+
+    # perform movement
+    if abs(movement) > 3 and verbose:
+        print("Movement limited to three squares in a turn.")
+    movement = max(min(int(movement), 3), -3)  # fix to range [-3, 3]
+    while movement:
+        if movement > 0:
+            if maze.is_permissible(robot_pos['location'], robot_pos['heading']):
+                robot_pos['location'][0] += dir_move[robot_pos['heading']][0]
+                robot_pos['location'][1] += dir_move[robot_pos['heading']][1]
+                movement -= 1
+            else:
+                if verbose:
+                    print("Movement stopped by wall.")
+                movement = 0
+        else:
+            rev_heading = dir_reverse[robot_pos['heading']]
+            if maze.is_permissible(robot_pos['location'], rev_heading):
+                robot_pos['location'][0] += dir_move[rev_heading][0]
+                robot_pos['location'][1] += dir_move[rev_heading][1]
+                movement += 1
+            else:
+                if verbose:
+                    print("Movement stopped by wall.")
+                movement = 0
+
+
+def goal_reached(maze, location):
+    """Returns true if the location lies inside the center goal room."""
+    goal_bounds = [maze.dim / 2 - 1, maze.dim / 2]
+    return location[0] in goal_bounds and location[1] in goal_bounds
+
+
+def score(runtimes):
+    """Returns the score of a completed trial, lower is better."""
+    return runtimes[1] + train_score_mult * runtimes[0]
+
+
+def new_trial(time_limit=max_time):
+    """Returns the state of a trial that has not started yet."""
+    return {'run': 0, 'robot_pos': None, 'hit_goal': False, 'total_time': 0,
+            'runtimes': [], 'first_goal': None, 'max_time': time_limit}
+
+
+def run_trial(maze, testrobot, verbose=True, trial=None,
+              checkpoint_file=None, checkpoint_every=10000,
+              stop_at_goal=False):
+    """
+    Tests the robot on the maze over two runs and returns a dictionary with
+    the time spent in each completed run ('runtimes'), the total number of
+    time steps used ('total_time'), the 'score', which is None if the
+    robot did not complete both runs in the allotted time, and the time step
+    at which the robot first entered the goal room ('first_goal').
+
+    Mazes in which the goal room cannot be reached from the start are not
+    simulated; their 'score' is None. The check only needs the maze's
+    connected components, see Maze.reaches_goal().
 
-    # Intitialize a robot; robot receives info about maze dimensions.
-    testrobot = Robot(maze.dim)
+    A trial state from new_trial() can be given to change the time limit, or
+    one restored from a checkpoint to resume an interrupted trial. If a
+    checkpoint file is given, the state of the trial and the robot is saved
+    to it every checkpoint_every time steps, see checkpoint.py.
+
+    With stop_at_goal, the trial ends as soon as the robot first enters the
+    goal room, for measuring only the time until then; its 'score' is None.
+    """
+    if not maze.reaches_goal([0, 0]):
+        if verbose:
+            print("Goal room cannot be reached from the start, skipping maze.")
+        return {'runtimes': [], 'total_time': 0, 'score': None,
+                'first_goal': None}
 
     # Record robot performance over two runs.
-    runtimes = []
-    total_time = 0
-    for run in range(2):
-        print("Starting run {}.".format(run))
+    if trial is None:
+        trial = new_trial()
+    runtimes = trial['runtimes']
+    while trial['run'] < 2:
+        run = trial['run']
+        if trial['robot_pos'] is None:
+            if verbose:
+                print("Starting run {}.".format(run))
 
-        # Set the robot in the start position. Note that robot position
-        # parameters are independent of the robot itself.
-        robot_pos = {'location': [0, 0], 'heading': 'up'}
+            # Set the robot in the start position. Note that robot position
+            # parameters are independent of the robot itself.
+            trial['robot_pos'] = {'location': [0, 0], 'heading': 'up'}
+            trial['hit_goal'] = False
+        robot_pos = trial['robot_pos']
 
         run_active = True
-        hit_goal = False
         while run_active:
+            if (checkpoint_file is not None and trial['total_time'] and
+                    trial['total_time'] % checkpoint_every == 0):
+                save_checkpoint(checkpoint_file, testrobot, trial)
+
             # check for end of time
-            total_time += 1
-            if total_time > max_time:
+            trial['total_time'] += 1
+            total_time = trial['total_time']
+            if total_time > trial['max_time']:
                 run_active = False
-                print("Allotted time exceeded.")
+                if verbose:
+                    print("Allotted time exceeded.")
                 break
 
             # provide robot with sensor information, get actions
-            sensing = [maze.dist_to_wall(robot_pos['location'], heading)
-                       for heading in dir_sensors[robot_pos['heading']]]
+            sensing = sense(maze, robot_pos)
             rotation, movement = testrobot.next_move(sensing)
 
             # check for a reset
             if (rotation, movement) == ('Reset', 'Reset'):
-                if run == 0 and hit_goal:
+                if run == 0 and trial['hit_goal']:
                     run_active = False
                     runtimes.append(total_time)
-                    print("Ending first run. Starting next run.")
+                    if verbose:
+                        print("Ending first run. Starting next run.")
                     break
-                elif run == 0 and not hit_goal:
-                    print("Cannot reset - robot has not hit goal yet.")
+                elif run == 0 and not trial['hit_goal']:
+                    if verbose:
+                        print("Cannot reset - robot has not hit goal yet.")
                     continue
                 else:
-                    print("Cannot reset on runs after the first.")
+                    if verbose:
+                        print("Cannot reset on runs after the first.")
                     continue
 
-            # perform rotation
-            if rotation == -90:
-                robot_pos['heading'] = dir_sensors[robot_pos['heading']][0]
-            elif rotation == 90:
-                robot_pos['heading'] = dir_sensors[robot_pos['heading']][2]
-            elif rotation == 0:
-                pass
-            else:
-                print("Invalid rotation value, no rotation performed.")
-
-            # perform movement
-            if abs(movement) > 3:
-                print("Movement limited to three squares in a turn.")
-            movement = max(min(int(movement), 3), -3)  # fix to range [-3, 3]
-            while movement:
-                if movement > 0:
-                    if maze.is_permissible(robot_pos['location'], robot_pos['heading']):
-                        robot_pos['location'][0] += dir_move[robot_pos['heading']][0]
-                        robot_pos['location'][1] += dir_move[robot_pos['heading']][1]
-                        movement -= 1
-                    else:
-                        print("Movement stopped by wall.")
-                        movement = 0
-                else:
-                    rev_heading = dir_reverse[robot_pos['heading']]
-                    if maze.is_permissible(robot_pos['location'], rev_heading):
-                        robot_pos['location'][0] += dir_move[rev_heading][0]
-                        robot_pos['location'][1] += dir_move[rev_heading][1]
-                        movement += 1
-                    else:
-                        print("Movement stopped by wall.")
-                        movement = 0
+            apply_move(maze, robot_pos, rotation, movement, verbose)
 
             # check for goal entered
-            goal_bounds = [maze.dim / 2 - 1, maze.dim / 2]
-
-            if (robot_pos['location'][0] in goal_bounds and
-                    robot_pos['location'][1] in goal_bounds):
-                hit_goal = True
+            if goal_reached(maze, robot_pos['location']):
+                trial['hit_goal'] = True
+                if trial['first_goal'] is None:
+                    trial['first_goal'] = total_time
+                    if stop_at_goal:
+                        return {'runtimes': runtimes, 'total_time': total_time,
+                                'score': None, 'first_goal': total_time}
                 if run != 0:
                     runtimes.append(total_time - sum(runtimes))
                     run_active = False
-                    print("Goal found; run {} completed!".format(run))
+                    if verbose:
+                        print("Goal found; run {} completed!".format(run))
+
+        trial['run'] += 1
+        trial['robot_pos'] = None
+
+    return {'runtimes': runtimes,
+            'total_time': min(trial['total_time'], trial['max_time']),
+            'score': score(runtimes) if len(runtimes) == 2 else None,
+            'first_goal': trial['first_goal']}
+
+
+if __name__ == '__main__':
+    '''
+    This script tests an agent implementation based on the code in robot.py 
+    on a maze given as an argument when running the script. An exploration
+    strategy can be selected with an optional second argument.
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('maze', help='maze file')
+    parser.add_argument('strategy', nargs='?', default='tremaux',
+                        help='exploration strategy, see strategies.py')
+    parser.add_argument('--seed', type=int, help='seed of the robot')
+    parser.add_argument('--max-time', type=int, default=max_time,
+                        help='time limit of the trial in steps')
+    parser.add_argument('--checkpoint',
+                        help='periodically save the trial to this file')
+    parser.add_argument('--checkpoint-every', type=int, default=10000,
+                        help='steps between two checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume the trial saved in the checkpoint file')
+    parser.add_argument('--save-map', nargs='?', const='',
+                        help='save the learned map after the trial to this '
+                             'file, named after the map by default')
+    parser.add_argument('--load-map',
+                        help='warm start the robot from a saved map file')
+    parser.add_argument('--tiled', action='store_true',
+                        help='keep the maze and the robot maps in tile files '
+                             'with a bounded cache, for very large mazes')
+    parser.add_argument('--tile-size', type=int, default=64,
+                        help='side length of a tile in cells')
+    parser.add_argument('--cache-tiles', type=int, default=64,
+                        help='number of tiles cached per grid')
+    parser.add_argument('--no-draw', action='store_true',
+                        help="don't draw the maze and path afterwards")
+    args = parser.parse_args()
+    if args.tiled and (args.checkpoint or args.resume):
+        # Checkpoints hold the robot's maps as maze-sized arrays.
+        parser.error('--tiled cannot be combined with --checkpoint or '
+                     '--resume')
+    if args.tiled and not get_strategy(args.strategy).tiled:
+        parser.error("the '{}' strategy cannot be used with --tiled".format(
+            args.strategy))
+
+    # Create a maze based on input argument on command line.
+    storage = None
+    if args.tiled:
+        maze = TiledMaze(args.maze, tile_size=args.tile_size,
+                         cache_tiles=args.cache_tiles)
+        storage = TileStorage(tile_size=args.tile_size,
+                              cache_tiles=args.cache_tiles)
+    else:
+        maze = Maze(args.maze)
+
+    if args.resume:
+        # Continue with the robot and trial saved in the checkpoint.
+        testrobot, trial = load_checkpoint(args.checkpoint)
+        if testrobot.maze_dim != maze.dim:
+            raise Exception('Checkpoint does not match the maze dimensions!')
+    else:
+        # Intitialize a robot; robot receives info about maze dimensions.
+        testrobot = Robot(maze.dim, strategy=args.strategy, seed=args.seed,
+                          map_file=args.load_map, storage=storage)
+        trial = new_trial(args.max_time)
+
+    result = run_trial(maze, testrobot, trial=trial,
+                       checkpoint_file=args.checkpoint,
+                       checkpoint_every=args.checkpoint_every)
+    testrobot.close_log()
 
     # Report score if agent is successful.
-    if len(runtimes) == 2:
-        print("Task complete! Score: {:4.3f}".format(
-            runtimes[1] + train_score_mult * runtimes[0]))
+    if result['score'] is not None:
+        print("Task complete! Score: {:4.3f} (race: {} steps, optimal race: "
+              "{} steps)".format(result['score'], result['runtimes'][1],
+                                 maze.optimal_race_steps))
+
+    if args.save_map is not None:
+        if testrobot.policy_grid[testrobot.orig_x][testrobot.orig_y]:
+            print("Saved map to " +
+                  testrobot.save_known_map(args.save_map or None))
+        else:
+            print("Robot has not found the goal room, no map saved.")
+
+    if args.no_draw:
+        sys.exit()
 
     # --- Draw maze and robot path --- #
 
@@ -138,7 +294,7 @@ if __name__ == '__main__':
     window.update()
     window.tracer(1)
 
-    draw_path("path.json", pen, origin, sq_size)
+    draw_path(testrobot.log_filename, pen, origin, sq_size)
 
     pen.hideturtle()
     window.exitonclick()
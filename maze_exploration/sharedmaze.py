@@ -0,0 +1,138 @@
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from maze import Maze
+
+# Mazes attached by this process, keyed by the name of their walls block.
+# Attaching every maze once per process lets pool workers reuse it for all
+# of their tasks. A worker gets the tasks of one maze after the other, so
+# the previous maze is detached as soon as a task for a new one arrives.
+_attached = {}
+
+
+def release_blocks(blocks):
+    """Closes and removes shared memory blocks."""
+    for block in blocks:
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedMaze(object):
+    """
+    Publishes the arrays of a maze in shared memory, so that worker
+    processes can use the maze without reading, validating or unpickling it.
+
+    Besides the walls, the sensing table and the connected component labels,
+    which tell whether the goal room can be reached, are computed once and
+    published as well. Workers get the maze by passing the small, picklable
+    descriptor to attach_maze().
+
+    The publishing process owns the shared memory blocks. They are removed
+    by close(), when leaving a with block, when the object is garbage
+    collected or at interpreter exit. If the publishing process is killed,
+    the multiprocessing resource tracker removes the blocks.
+    """
+
+    def __init__(self, maze):
+        arrays = {'walls': maze.walls,
+                  'sensing_table': maze.sensing_table,
+                  'labels': maze.labels}
+
+        self.blocks = []
+        self.descriptor = {'dim': maze.dim, 'arrays': {}}
+        try:
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True,
+                                                   size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                view = np.ndarray(array.shape, dtype=array.dtype,
+                                  buffer=block.buf)
+                view[...] = array
+                self.descriptor['arrays'][name] = (block.name, array.shape,
+                                                   array.dtype.str)
+        except Exception:
+            release_blocks(self.blocks)
+            raise
+        self._finalizer = weakref.finalize(self, release_blocks, self.blocks)
+
+    def close(self):
+        """Removes the shared memory blocks. Attached workers keep their
+            mappings until they exit."""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_block(name):
+    """Attaches to an existing shared memory block without taking over its
+        ownership."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, attaching registers the block with the resource
+        # tracker, which removes it as soon as this process exits. The
+        # publishing process owns the block, so skip the registration.
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def attach_maze(descriptor):
+    """
+    Returns the maze published under the descriptor of a SharedMaze, backed
+    by read-only numpy views of the shared memory blocks.
+    """
+    walls_name = descriptor['arrays']['walls'][0]
+    if walls_name in _attached:
+        return _attached[walls_name]
+    for name in list(_attached):
+        detach_maze(_attached.pop(name))
+
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in descriptor['arrays'].items():
+        block = attach_block(block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    maze = Maze.from_walls(arrays['walls'], validate=False)
+    maze._sensing_table = arrays['sensing_table']
+    maze._labels = arrays['labels']
+    # The blocks have to stay open as long as the maze uses them.
+    maze._shared_blocks = blocks
+    _attached[walls_name] = maze
+    return maze
+
+
+def detach_maze(maze):
+    """
+    Closes the shared memory blocks of a maze returned by attach_maze(),
+    after which the maze must not be used anymore. Once the publishing
+    process has removed the blocks as well, their memory is freed.
+    """
+    blocks = maze._shared_blocks
+    maze._shared_blocks = []
+    # A block can only be closed when no numpy views of it are left.
+    maze.walls = maze._sensing_table = maze._labels = None
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # Still used elsewhere, the block is closed when that is
+            # garbage collected.
+            pass
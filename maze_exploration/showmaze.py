@@ -1,38 +1,38 @@
-import json
 import sys
 import turtle
 
 from maze import Maze
+from pathlog import read_path
 
 
-def draw_path(filepath, pen, origin, sq_size):
-    """"Reads a path from a file and draws it on the maze."""
+def draw_path(filepath, pen, origin, sq_size, start=0, stop=None):
+    """"Reads a path from a file and draws it on the maze.
+        Only the steps from start to stop are drawn, if given."""
     first = True
-    with open(filepath, 'r') as file_object:
-        for line in file_object:
-            x, y, visited, heading = json.loads(line)
-
-            if visited == 0:
-                color = 'gray'
-            elif visited == 1:
-                color = 'green yellow'
-            elif visited == 2:
-                color = 'gray'
-            elif visited == 3:
-                color = 'red'
-            else:
-                color = 'black'
-
-            if first:
-                pen.hideturtle()
-                pen.pensize(int(sq_size / 2))
-                pen.pencolor(color)
-                pen.setheading(90)
-                pen.goto(origin + sq_size / 2, origin + sq_size / 2)
-                pen.showturtle()
-                first = False
-            else:
-                draw_line(x, y, color, heading, pen, origin, sq_size)
+    for x, y, visited, heading in read_path(filepath, start, stop):
+
+        if visited == 0:
+            color = 'gray'
+        elif visited == 1:
+            color = 'green yellow'
+        elif visited == 2:
+            color = 'gray'
+        elif visited == 3:
+            color = 'red'
+        else:
+            color = 'black'
+
+        if first:
+            pen.hideturtle()
+            pen.pensize(int(sq_size / 2))
+            pen.pencolor(color)
+            pen.setheading(90)
+            pen.goto(origin + sq_size * x + sq_size / 2,
+                     origin + sq_size * y + sq_size / 2)
+            pen.showturtle()
+            first = False
+        else:
+            draw_line(x, y, color, heading, pen, origin, sq_size)
 
 
 def draw_line(x, y, color, heading, pen, origin, sq_size):
@@ -88,7 +88,9 @@ def draw_maze(maze, pen, origin, sq_size):
 if __name__ == '__main__':
     '''
     This script uses Python's turtle library to draw a picture of the maze
-    given as an argument when running the script.
+    given as an argument when running the script. If a path log is given as
+    second argument, the path is drawn as well. Optional third and fourth
+    arguments limit the drawing to a range of steps of the path.
     '''
 
     # Create a maze based on input argument on command line.
@@ -109,8 +111,10 @@ if __name__ == '__main__':
     window.update()
     window.tracer(1)
 
-    if len(sys.argv) == 3:
-        draw_path(str(sys.argv[2]), pen, origin, sq_size)
+    if len(sys.argv) >= 3:
+        start = int(sys.argv[3]) if len(sys.argv) >= 4 else 0
+        stop = int(sys.argv[4]) if len(sys.argv) >= 5 else None
+        draw_path(str(sys.argv[2]), pen, origin, sq_size, start, stop)
 
     pen.hideturtle()
     window.exitonclick()
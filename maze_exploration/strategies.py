@@ -0,0 +1,583 @@
+# coding: utf8
+import heapq
+from sys import stderr
+
+import numpy as np
+
+# Registry of all available exploration strategies, keyed by their name.
+STRATEGIES = {}
+
+
+def register_strategy(cls):
+    """Class decorator that adds an exploration strategy to the registry."""
+    STRATEGIES[cls.name] = cls
+    return cls
+
+
+def get_strategy(name):
+    """Returns the strategy class registered under the given name."""
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError("Unknown exploration strategy '{}', available "
+                         "strategies: {}".format(name,
+                                                 ', '.join(sorted(STRATEGIES))))
+
+
+class ExplorationStrategy(object):
+    """
+    Base class for exploration strategies.
+
+    A strategy is bound to a single robot and is called once per
+    next_move() while the robot is in exploration mode. It reads the robot's
+    sensors and sets the robot's rotation and movement for this step, using
+    the movement and mapping primitives the robot provides. When the strategy
+    decides that the maze is sufficiently mapped, it calls
+    robot.end_exploration().
+    """
+    name = None
+    # Whether the strategy keeps its state in the robot's TileStorage, so
+    # that its memory stays bounded for very large mazes, see tiles.py.
+    tiled = True
+
+    def __init__(self, robot):
+        self.robot = robot
+
+    def explore(self):
+        """Determine the robot's next exploration step."""
+        raise NotImplementedError
+
+    def get_state(self):
+        """Returns the strategy's internal state for checkpoints, as a pair
+            of a dictionary of plain values and a dictionary of numpy arrays."""
+        return {}, {}
+
+    def set_state(self, values, arrays):
+        """Restores the state returned by get_state()."""
+        pass
+
+
+@register_strategy
+class TremauxStrategy(ExplorationStrategy):
+    """Explore a maze using Trémaux' algorithm."""
+    name = 'tremaux'
+
+    def explore(self):
+        robot = self.robot
+
+        if robot.is_beginning:
+            # This prevents the robot from immediately cancelling exploration
+            robot.is_beginning = False
+        elif robot.finished_exploration():
+            # When back at the start, end the exploration
+            robot.end_exploration()
+            robot.mark_path()
+            return
+
+        # When in reversing mode, just finish the rotation and move forward
+        if robot.is_reversing:
+            robot.rotation = 90
+            robot.movement = 1
+            robot.is_reversing = False
+            return
+
+        # Translate sensor readings into unblocked directions
+        open_directions = robot.check_open_directions()
+        # Update the internal mapping of the maze
+        robot.update_map(open_directions)
+
+        # --------------------------------------
+        # Trémaux' algorithm
+        # --------------------------------------
+
+        if len(open_directions) == 0:
+            # Robot is at a deadend
+            # Start backtracking
+            robot.reverse()
+            robot.mark_path(robot.DOUBLE_VISITED)
+
+        elif len(open_directions) == 1:
+            # Robot is on a path to the next junction
+            robot.follow_path(open_directions.pop())
+            robot.mark_path()
+
+        elif len(open_directions) > 1:
+            # Robot is at a junction
+            if robot.path_is(robot.UNVISITED):
+                # Robot is at a new junction
+                # Store the direction to the path which has led to this junction, used for backtracking.
+                robot.path_map[robot.x][robot.y].previous = robot.opposite[
+                    robot.heading]
+                # Get the adjacent paths that are still unvisited.
+                unvisited_paths = robot.get_paths(open_directions, robot.UNVISITED)
+                if len(unvisited_paths) > 0:
+                    # There are still unvisited paths branching from this junction,
+                    # follow the one preferred by the branch policy.
+                    robot.follow_path(unvisited_paths[0])
+                    # Mark this junction for the first time
+                    robot.mark_path()
+                else:
+                    # This junction has no unvisited paths left,
+                    # treat it like a dead end.
+                    robot.reverse()
+                    robot.mark_path(robot.DOUBLE_VISITED)
+
+            elif robot.path_is(robot.VISITED):
+                # Robot is at an old junction
+                if robot.path_is(robot.DOUBLE_VISITED, robot.last_x, robot.last_y):
+                    # Robot is backtracking
+                    unvisited_paths = robot.get_paths(open_directions, robot.UNVISITED)
+                    if len(unvisited_paths) > 0:
+                        # There is still at least one unvisited path branching from this junction
+                        # Follow the one preferred by the branch policy.
+                        robot.follow_path(unvisited_paths[0])
+                    else:
+                        # There are no unvisited paths branching from this junction.
+                        # Continue backtracking.
+                        robot.continue_backtracking()
+                        # Mark this junction for the second time
+                        robot.mark_path()
+                else:
+                    # Robot has stepped into an old junction while not backtracking,
+                    # so treat it like a deadend.
+                    robot.reverse()
+            else:
+                print("The junction at position " + str((robot.x, robot.y)) +
+                      " has no valid value.", file=stderr)
+
+
+class DistanceField(object):
+    """
+    Distances of the cells of a maze to a set of target cells, assuming that
+    all walls which have not been sensed yet are open, kept up to date with
+    D* Lite while the robot moves and senses new walls.
+
+    g holds the distance of every cell and rhs the distance its neighbors
+    promise, one more than the lowest g among them. Cells where both differ
+    are queued. The queue is only worked off as far as needed to make the
+    distance of the robot's cell and its neighbors exact, in order of the
+    distance through a cell plus the heuristic distance from the robot to
+    it. Cells far away from the robot's route stay queued until they matter,
+    so the cost of a step depends on how much of the route changes, not on
+    the size of the maze.
+    """
+
+    def __init__(self, strategy, targets, position):
+        self.strategy = strategy
+        self.targets = targets
+        self.unreachable = strategy.unreachable
+        # Without inner walls, the distances are Manhattan distances, so
+        # all cells start out consistent.
+        xs, ys = np.indices((strategy.robot.maze_dim,) * 2)
+        self.g = np.min([np.abs(xs - tx) + np.abs(ys - ty)
+                         for tx, ty in targets], axis=0)
+        self.rhs = self.g.copy()
+        # Heap of (key, cell) entries and the current key of every queued
+        # cell. Entries whose key is outdated are skipped when popped.
+        self.queue = []
+        self.queued = {}
+        # Robot position and the accumulated heuristic offset, which keeps
+        # the keys of queued cells valid while the robot moves.
+        self.position = position
+        self.km = 0
+
+    def get_state(self):
+        queue = np.array([key + cell for cell, key in
+                          sorted(self.queued.items())],
+                         dtype=np.int64).reshape(-1, 4)
+        return ({'position': list(self.position), 'km': self.km},
+                {'g': self.g, 'rhs': self.rhs, 'queue': queue})
+
+    def set_state(self, values, arrays):
+        self.position = tuple(values['position'])
+        self.km = values['km']
+        self.g = arrays['g'].copy()
+        self.rhs = arrays['rhs'].copy()
+        self.queued = {(int(x), int(y)): (int(k1), int(k2))
+                       for k1, k2, x, y in arrays['queue']}
+        self.queue = [(key, cell) for cell, key in self.queued.items()]
+        heapq.heapify(self.queue)
+
+    def key(self, cell):
+        x, y = cell
+        distance = int(min(self.g[cell], self.rhs[cell]))
+        heuristic = abs(x - self.position[0]) + abs(y - self.position[1])
+        return distance + heuristic + self.km, distance
+
+    def update_cell(self, cell):
+        """Recomputes the rhs value of a cell and queues it if it is
+            inconsistent."""
+        if cell not in self.targets:
+            self.rhs[cell] = min([self.g[nx, ny] for _, nx, ny in
+                                  self.strategy.accessible_neighbors(*cell)] +
+                                 [self.unreachable - 1]) + 1
+        if self.g[cell] != self.rhs[cell]:
+            key = self.key(cell)
+            self.queued[cell] = key
+            heapq.heappush(self.queue, (key, cell))
+        else:
+            self.queued.pop(cell, None)
+
+    def top(self):
+        """Returns the lowest queued key and cell, dropping outdated
+            entries."""
+        while self.queue:
+            key, cell = self.queue[0]
+            if self.queued.get(cell) == key:
+                return key, cell
+            heapq.heappop(self.queue)
+        return None, None
+
+    def walls_changed(self, cells):
+        """Updates the cells next to newly sensed walls."""
+        for cell in cells:
+            self.update_cell(cell)
+
+    def move_to(self, position):
+        """Moves the robot, which changes the heuristic of all cells by at
+            most the distance moved."""
+        self.km += (abs(position[0] - self.position[0]) +
+                    abs(position[1] - self.position[1]))
+        self.position = position
+
+    def distance(self):
+        """Works off the queue as far as needed and returns the exact
+            distance of the robot's cell."""
+        position = self.position
+        while True:
+            key, cell = self.top()
+            if cell is None or (key >= self.key(position) and
+                                self.g[position] == self.rhs[position]):
+                break
+            new_key = self.key(cell)
+            if key < new_key:
+                self.queued[cell] = new_key
+                heapq.heapreplace(self.queue, (new_key, cell))
+                continue
+            heapq.heappop(self.queue)
+            del self.queued[cell]
+            neighbors = [(nx, ny) for _, nx, ny in
+                         self.strategy.accessible_neighbors(*cell)]
+            if self.g[cell] > self.rhs[cell]:
+                self.g[cell] = self.rhs[cell]
+            else:
+                self.g[cell] = self.unreachable
+                self.update_cell(cell)
+            for neighbor in neighbors:
+                self.update_cell(neighbor)
+        return int(self.g[position])
+
+
+@register_strategy
+class FloodFillStrategy(ExplorationStrategy):
+    """
+    Explore a maze like a micromouse using the flood fill algorithm.
+
+    The strategy keeps an estimate of the distance to the goal room for every
+    cell, assuming that all walls which have not been sensed yet are open.
+    The robot always moves to the accessible neighbor with the lowest
+    distance. Whenever new walls are sensed, the distances are repaired
+    incrementally with D* Lite, see DistanceField, instead of flooding the
+    whole maze again.
+
+    After reaching the goal room, the robot returns to the start the same way,
+    which maps an alternative route back. Exploration ends at the start once
+    the shortest route through the mapped part of the maze is as short as the
+    optimistic estimate, which means that no unknown part of the maze can
+    contain a shorter route.
+    """
+    name = 'floodfill'
+    # The distance fields are maze-sized arrays in memory.
+    tiled = False
+
+    def __init__(self, robot):
+        super(FloodFillStrategy, self).__init__(robot)
+        dim = robot.maze_dim
+        # Distance value for cells without any known path to the target.
+        self.unreachable = dim * dim
+
+        # Bitmask of all walls that have been sensed, using the same bit
+        # values as the robot's maze_map. An edge is blocked if it is known
+        # but not open. The outer walls of the maze are known from the start.
+        self.known = np.zeros((dim, dim), dtype=np.uint8)
+        self.known[:, dim - 1] |= robot.wall_values['up']
+        self.known[dim - 1, :] |= robot.wall_values['right']
+        self.known[:, 0] |= robot.wall_values['down']
+        self.known[0, :] |= robot.wall_values['left']
+
+        half = dim // 2
+        self.goal_room = [(half - 1, half - 1), (half - 1, half),
+                          (half, half - 1), (half, half)]
+        self.start = [(robot.orig_x, robot.orig_y)]
+        # The robot waits when no route is left, which is reported only once.
+        self.reported_no_route = False
+
+        # Optimistic distances towards the goal room and the start.
+        position = (robot.x, robot.y)
+        self.to_goal = DistanceField(self, self.goal_room, position)
+        self.to_start = DistanceField(self, self.start, position)
+
+        # The robot first runs to the goal room, then back to the start.
+        self.target = 'goal'
+
+    def get_state(self):
+        values = {'target': self.target}
+        arrays = {'known': self.known}
+        for name in ('to_goal', 'to_start'):
+            field_values, field_arrays = getattr(self, name).get_state()
+            values[name] = field_values
+            for array_name, array in field_arrays.items():
+                arrays[name + '_' + array_name] = array
+        return values, arrays
+
+    def set_state(self, values, arrays):
+        self.target = values['target']
+        self.known = arrays['known'].copy()
+        for name in ('to_goal', 'to_start'):
+            prefix = name + '_'
+            getattr(self, name).set_state(
+                values[name], {array_name[len(prefix):]: array
+                               for array_name, array in arrays.items()
+                               if array_name.startswith(prefix)})
+
+    def is_blocked(self, x, y, direction):
+        """Returns true if a wall is known to block the given direction."""
+        value = self.robot.wall_values[direction]
+        return bool(self.known[x, y] & value and
+                    not self.robot.maze_map[x][y] & value)
+
+    def accessible_neighbors(self, x, y):
+        """Yields direction and coordinates of all neighbors not known to be
+            blocked off by a wall."""
+        for direction, (dx, dy) in self.robot.direction_to_vec.items():
+            if not self.is_blocked(x, y, direction):
+                yield direction, x + dx, y + dy
+
+    def sense_walls(self):
+        """
+        Map the walls along the rays of all three sensors and return the cells
+        next to newly discovered walls.
+        """
+        robot = self.robot
+        changed = []
+        global_dirs = [robot.dict_rotation[robot.heading][0], robot.heading,
+                       robot.dict_rotation[robot.heading][1]]
+        for direction, distance in zip(global_dirs, robot.sensors):
+            dx, dy = robot.direction_to_vec[direction]
+            value = robot.wall_values[direction]
+            opposite_value = robot.wall_values[robot.opposite[direction]]
+            x, y = robot.x, robot.y
+            for step in range(distance + 1):
+                if self.known[x, y] & value:
+                    # The rest of this ray has been sensed before.
+                    break
+                self.known[x, y] |= value
+                if step < distance:
+                    # Open edge: update both cells sharing it.
+                    robot.maze_map[x][y] |= value
+                    x, y = x + dx, y + dy
+                    robot.maze_map[x][y] |= opposite_value
+                    self.known[x, y] |= opposite_value
+                else:
+                    # Wall at the end of the ray
+                    changed.append((x, y))
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < robot.maze_dim and 0 <= ny < robot.maze_dim:
+                        self.known[nx, ny] |= opposite_value
+                        changed.append((nx, ny))
+        return changed
+
+    def known_distance(self):
+        """Length of the shortest path from the start to the goal room
+            which only uses mapped openings."""
+        robot = self.robot
+        distances = {self.start[0]: 0}
+        frontier = [self.start[0]]
+        while frontier:
+            next_frontier = []
+            for x, y in frontier:
+                if (x, y) in self.goal_room:
+                    return distances[(x, y)]
+                for direction, (dx, dy) in robot.direction_to_vec.items():
+                    nxt = (x + dx, y + dy)
+                    if (robot.maze_map[x][y] & robot.wall_values[direction]
+                            and nxt not in distances):
+                        distances[nxt] = distances[(x, y)] + 1
+                        next_frontier.append(nxt)
+            frontier = next_frontier
+        return self.unreachable
+
+    def explore(self):
+        robot = self.robot
+
+        # When in reversing mode, just finish the rotation and move forward
+        if robot.is_reversing:
+            robot.rotation = 90
+            robot.movement = 1
+            robot.is_reversing = False
+            return
+
+        position = (robot.x, robot.y)
+        changed = self.sense_walls()
+        for field in (self.to_goal, self.to_start):
+            field.move_to(position)
+            field.walls_changed(changed)
+
+        if robot.path_is(robot.UNVISITED):
+            robot.mark_path(robot.VISITED)
+
+        if self.target == 'goal' and position in self.goal_room:
+            # Goal room reached, head back to confirm a route to the start.
+            self.target = 'start'
+        elif self.target == 'start' and position in self.start:
+            if self.to_goal.distance() >= self.known_distance():
+                # The mapped route is provably the shortest one.
+                robot.end_exploration()
+                return
+            # A shorter route may exist through unmapped cells, try it.
+            self.target = 'goal'
+
+        field = self.to_goal if self.target == 'goal' else self.to_start
+        if field.distance() >= self.unreachable:
+            if robot.verbose and not self.reported_no_route:
+                print("Flood fill found no route to the " + self.target + ".")
+                self.reported_no_route = True
+            return
+
+        # Move towards the neighbor closest to the target. Ties are broken in
+        # favor of going straight, turning is preferred to reversing.
+        preference = [robot.heading] + robot.dict_rotation[robot.heading] + \
+                     [robot.opposite[robot.heading]]
+        neighbors = {direction: field.g[nx, ny] for direction, nx, ny in
+                     self.accessible_neighbors(robot.x, robot.y)}
+        direction = min(neighbors, key=lambda d: (neighbors[d],
+                                                  preference.index(d)))
+
+        if direction == robot.opposite[robot.heading]:
+            robot.reverse()
+        else:
+            robot.rotation = robot.direction_to_rotation[robot.heading].get(
+                direction, 0)
+            robot.movement = 1
+
+
+@register_strategy
+class CooperativeStrategy(ExplorationStrategy):
+    """
+    Explore a maze with a depth-first search that can be shared by several
+    robots.
+
+    Every robot keeps its own stack of cells that lead back to its start,
+    while the visited cells are marked in a map that may be shared with other
+    robots. Before heading into an unvisited cell, a robot claims it, so that
+    no other robot heads into the same branch. A robot finishes exploration
+    when it is back at its start and no unvisited, unclaimed cells are left
+    around any cell of its stack.
+    """
+    name = 'cooperative'
+    # The stack and the claims are lists and dictionaries in memory, which
+    # may grow with the maze.
+    tiled = False
+
+    def __init__(self, robot):
+        super(CooperativeStrategy, self).__init__(robot)
+        # Cells claimed by a robot that is on its way to visit them.
+        if robot.shared_map is not None:
+            self.claims = robot.shared_map.claims
+        else:
+            self.claims = {}
+        # Path of cells leading back to the start
+        self.stack = []
+        # Number of cells visited first by this robot
+        self.visited = 0
+        # The wall behind the robot is only sensed by turning at the start,
+        # which is unnecessary when it faces up from the bottom row.
+        self.needs_scan = robot.orig_y != 0
+
+    def get_state(self):
+        # Claims of a shared map belong to the whole team and are not
+        # part of a single robot's state.
+        claims = [] if self.robot.shared_map is not None else list(self.claims)
+        return ({'stack': [list(cell) for cell in self.stack],
+                 'claims': [list(cell) for cell in claims],
+                 'visited': self.visited,
+                 'needs_scan': self.needs_scan}, {})
+
+    def set_state(self, values, arrays):
+        self.stack = [tuple(cell) for cell in values['stack']]
+        for cell in values['claims']:
+            self.claims[tuple(cell)] = self.robot
+        self.visited = values['visited']
+        self.needs_scan = values['needs_scan']
+
+    def head_to(self, direction):
+        """Rotate towards an adjacent cell in the given global direction
+            and move there."""
+        robot = self.robot
+        if direction == robot.opposite[robot.heading]:
+            robot.reverse()
+        else:
+            robot.rotation = robot.direction_to_rotation[robot.heading].get(
+                direction, 0)
+            robot.movement = 1
+
+    def explore(self):
+        robot = self.robot
+
+        # When in reversing mode, just finish the rotation and move forward
+        if robot.is_reversing:
+            robot.rotation = 90
+            robot.movement = 1
+            robot.is_reversing = False
+            return
+
+        # Update the internal mapping of the maze
+        robot.update_map(robot.check_open_directions())
+
+        if self.needs_scan:
+            # Turn to sense the wall behind the start, without moving.
+            self.needs_scan = False
+            robot.rotation = 90
+            return
+
+        position = (robot.x, robot.y)
+        if self.claims.get(position) is robot:
+            del self.claims[position]
+        if robot.path_is(robot.UNVISITED):
+            robot.mark_path(robot.VISITED)
+            self.visited += 1
+
+        # Look for unvisited cells that are not claimed by another robot.
+        # Going straight is preferred, reversing is the last resort.
+        preference = [robot.heading] + robot.dict_rotation[robot.heading] + \
+                     [robot.opposite[robot.heading]]
+        for direction in preference:
+            if not robot.maze_map[robot.x][robot.y] & robot.wall_values[direction]:
+                continue
+            dx, dy = robot.direction_to_vec[direction]
+            cell = (robot.x + dx, robot.y + dy)
+            if (robot.path_is(robot.UNVISITED, cell[0], cell[1]) and
+                    self.claims.get(cell, robot) is robot):
+                self.claims[cell] = robot
+                self.stack.append(position)
+                self.head_to(direction)
+                return
+
+        # Nothing left to explore from here
+        robot.mark_path(robot.DOUBLE_VISITED)
+        if not self.stack:
+            if robot.shared_map is None:
+                robot.end_exploration()
+            else:
+                # The map is not complete before all robots have finished,
+                # so this robot just signals that it is done.
+                robot.mode = "finished"
+                robot.rotation = "Reset"
+                robot.movement = "Reset"
+            return
+
+        # Backtrack to the previous cell on the stack
+        x, y = self.stack.pop()
+        for direction, vec in robot.direction_to_vec.items():
+            if vec == [x - robot.x, y - robot.y]:
+                self.head_to(direction)
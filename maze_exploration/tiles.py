@@ -0,0 +1,616 @@
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+from collections import deque
+
+import numpy as np
+
+from maze import Maze
+from maze import connected_components
+
+
+def release_pages(buffer, offset, length):
+    """Drops a range of a file mapping from the resident memory of the
+        process, where the operating system supports it. The data stays in
+        the file."""
+    if hasattr(mmap, 'MADV_DONTNEED') and offset % mmap.PAGESIZE == 0:
+        buffer.madvise(mmap.MADV_DONTNEED, offset, length)
+
+
+class Column(object):
+    """Column x of a grid, so that grid[x][y] can be used like grid[x, y]."""
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __len__(self):
+        return len(self.grid)
+
+    def __iter__(self):
+        for y in range(len(self.grid)):
+            yield self.grid[self.x, y]
+
+    def __getitem__(self, y):
+        return self.grid[self.x, y]
+
+    def __setitem__(self, y, value):
+        self.grid[self.x, y] = value
+
+
+class Grid(object):
+    """Base class of the grids in this module, which are indexed by cell as
+        grid[x, y] or, like nested lists, as grid[x][y]."""
+    dim = 0
+
+    def __len__(self):
+        return self.dim
+
+    def __iter__(self):
+        for x in range(self.dim):
+            yield Column(self, x)
+
+    def column(self, x):
+        if not 0 <= x < self.dim:
+            raise IndexError('Grid column out of range: {}'.format(x))
+        return Column(self, x)
+
+
+class TiledGrid(Grid):
+    """
+    A square grid of numbers that is split into square tiles, which are
+    stored one after another in a memory-mapped file. Only the most recently
+    used tiles are held in memory, at most cache_tiles of them. Changed tiles
+    are written back to the file when they are evicted from the cache and on
+    flush(), so the resident memory is bounded by the cache size, not by the
+    size of the grid. A new grid is filled with zeros.
+    """
+
+    def __init__(self, filename, dim, dtype=np.uint8, tile_size=64,
+                 cache_tiles=64, create=True):
+        self.filename = filename
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.tile_size = tile_size
+        self.cache_tiles = cache_tiles
+        self.tiles_per_side = -(-dim // tile_size)
+        self.tile_bytes = tile_size * tile_size * self.dtype.itemsize
+        size = self.tiles_per_side ** 2 * self.tile_bytes
+
+        if create:
+            # The file is sparse, tiles that are never written take no space.
+            with open(filename, 'wb') as file_object:
+                file_object.truncate(size)
+        elif os.path.getsize(filename) != size:
+            raise Exception('Tile file does not match the grid size: ' +
+                            filename)
+        with open(filename, 'r+b') as file_object:
+            self.mmap = mmap.mmap(file_object.fileno(), size)
+
+        # Cached tiles by tile number, least recently used first
+        self.cache = OrderedDict()
+        self.dirty = set()
+        # Most recently used tile, which is looked up without touching the
+        # cache order, as most accesses stay in the same tile.
+        self.last_number = None
+        self.last_tile = None
+
+    @property
+    def shape(self):
+        return self.dim, self.dim
+
+    @property
+    def resident_bytes(self):
+        """Memory used by the cached tiles."""
+        return len(self.cache) * self.tile_bytes
+
+    def __getitem__(self, key):
+        if type(key) is not tuple:
+            return self.column(key)
+        tile, i, j = self.locate(*key)
+        return tile.item(i, j)
+
+    def __setitem__(self, key, value):
+        tile, i, j = self.locate(*key)
+        tile[i, j] = value
+        self.dirty.add(self.last_number)
+
+    def locate(self, x, y):
+        """Returns the tile holding cell (x, y) and the cell's position in
+            the tile."""
+        if not (0 <= x < self.dim and 0 <= y < self.dim):
+            raise IndexError('Grid cell out of range: {}'.format((x, y)))
+        size = self.tile_size
+        return (self.tile((x // size) * self.tiles_per_side + y // size),
+                x % size, y % size)
+
+    def tile(self, number):
+        """Returns a tile by its number, loading it into the cache if
+            needed."""
+        if number == self.last_number:
+            return self.last_tile
+        tile = self.cache.get(number)
+        if tile is None:
+            if len(self.cache) >= self.cache_tiles:
+                self.evict()
+            tile = self.read_tile(number)
+            self.cache[number] = tile
+        else:
+            self.cache.move_to_end(number)
+        self.last_number, self.last_tile = number, tile
+        return tile
+
+    def evict(self):
+        """Removes the least recently used tile from the cache."""
+        number, tile = self.cache.popitem(last=False)
+        if number == self.last_number:
+            self.last_number = self.last_tile = None
+        if number in self.dirty:
+            self.write_tile(number, tile)
+            self.dirty.discard(number)
+
+    def read_tile(self, number):
+        offset = number * self.tile_bytes
+        tile = np.frombuffer(self.mmap, dtype=self.dtype,
+                             count=self.tile_size * self.tile_size,
+                             offset=offset).reshape(self.tile_size,
+                                                    self.tile_size).copy()
+        release_pages(self.mmap, offset, self.tile_bytes)
+        return tile
+
+    def write_tile(self, number, tile):
+        offset = number * self.tile_bytes
+        self.mmap[offset:offset + self.tile_bytes] = tile.tobytes()
+        release_pages(self.mmap, offset, self.tile_bytes)
+
+    def set_row(self, x, values):
+        """Sets the cells (x, 0) to (x, dim - 1) from an array."""
+        size = self.tile_size
+        for ty in range(self.tiles_per_side):
+            tile, i, _ = self.locate(x, ty * size)
+            row = values[ty * size:(ty + 1) * size]
+            tile[i, :len(row)] = row
+            self.dirty.add(self.last_number)
+
+    def assign(self, values):
+        """Sets all cells from an array of shape (dim, dim)."""
+        for x in range(self.dim):
+            self.set_row(x, values[x])
+
+    def flush(self):
+        """Writes all changed tiles back to the file."""
+        for number in self.dirty:
+            self.write_tile(number, self.cache[number])
+        self.dirty.clear()
+        self.mmap.flush()
+
+    def close(self):
+        if self.mmap.closed:
+            return
+        self.flush()
+        self.cache.clear()
+        self.last_number = self.last_tile = None
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CodedGrid(Grid):
+    """
+    A grid of names, like the robot's policy grid, stored as the names'
+    codes in a tiled grid. The code of a name is its index in names.
+    """
+
+    def __init__(self, grid, names):
+        self.grid = grid
+        self.dim = grid.dim
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+
+    def __getitem__(self, key):
+        if type(key) is not tuple:
+            return self.column(key)
+        return self.names[self.grid[key]]
+
+    def __setitem__(self, key, name):
+        self.grid[key] = self.codes[name]
+
+
+class CellView(object):
+    """A cell of a TiledCells map, see Robot.Cell."""
+    __slots__ = ('cells', 'key')
+
+    def __init__(self, cells, key):
+        self.cells = cells
+        self.key = key
+
+    @property
+    def value(self):
+        return self.cells.values[self.key]
+
+    @value.setter
+    def value(self, value):
+        self.cells.values[self.key] = value
+
+    @property
+    def previous(self):
+        return self.cells.previous[self.key]
+
+    @previous.setter
+    def previous(self, direction):
+        self.cells.previous[self.key] = direction
+
+
+class TiledCells(Grid):
+    """
+    Tiled replacement of the robot's path map, a grid of Robot.Cell objects.
+    path_map[x][y] returns a view of a cell, whose value and previous
+    direction are stored in two tiled grids.
+    """
+
+    def __init__(self, values, previous, directions):
+        self.values = values
+        self.previous = CodedGrid(previous, directions)
+        self.dim = values.dim
+
+    def __getitem__(self, key):
+        if type(key) is not tuple:
+            return self.column(key)
+        return CellView(self, key)
+
+
+class CellQueue(object):
+    """
+    A first-in, first-out queue of (x, y, distance) entries, such as the
+    frontier of a breadth-first search. At most chunk_entries new entries
+    and chunk_entries entries read back are held in memory, the ones in
+    between are appended to a file.
+    """
+
+    def __init__(self, filename, chunk_entries=65536):
+        self.file_object = open(filename, 'w+b')
+        self.chunk_entries = chunk_entries
+        # Oldest entries, read back from the file
+        self.head = deque()
+        # Newest entries, which are written to the file when there are
+        # chunk_entries of them
+        self.tail = []
+        self.read_offset = 0
+        self.write_offset = 0
+
+    def __len__(self):
+        stored = (self.write_offset - self.read_offset) // (3 * 8)
+        return len(self.head) + stored + len(self.tail)
+
+    def append(self, entry):
+        self.tail.append(entry)
+        if len(self.tail) >= self.chunk_entries:
+            self.file_object.seek(self.write_offset)
+            data = np.array(self.tail, dtype=np.int64).tobytes()
+            self.file_object.write(data)
+            self.write_offset += len(data)
+            self.tail = []
+
+    def popleft(self):
+        if not self.head:
+            if self.read_offset < self.write_offset:
+                self.file_object.seek(self.read_offset)
+                entries = np.fromfile(self.file_object, dtype=np.int64,
+                                      count=3 * self.chunk_entries)
+                self.read_offset += entries.nbytes
+                if self.read_offset == self.write_offset:
+                    # Everything is read, the file can be reused from the
+                    # start.
+                    self.read_offset = self.write_offset = 0
+                self.head = deque(map(tuple, entries.reshape(-1, 3).tolist()))
+            else:
+                self.head = deque(self.tail)
+                self.tail = []
+        return self.head.popleft()
+
+    def close(self):
+        self.file_object.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TileStorage(object):
+    """
+    Creates the tiled grids of a robot's maps, see Robot.new_grid(). The tile
+    files are kept in a directory, by default a temporary one which is
+    removed by close() or when the storage is garbage collected.
+
+    Each grid caches up to cache_tiles tiles, so a robot using the storage
+    holds at most five grids (maze map, path values and directions, policy
+    and search grid) times cache_tiles tiles in memory.
+    """
+
+    def __init__(self, directory=None, tile_size=64, cache_tiles=64):
+        self.tile_size = tile_size
+        self.cache_tiles = cache_tiles
+        self.grids = {}
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='maze_tiles_')
+            self._finalizer = weakref.finalize(self, shutil.rmtree, directory,
+                                               True)
+        else:
+            self._finalizer = None
+        self.directory = directory
+
+    def grid(self, name, dim, values=None, dtype=np.uint8):
+        """Returns a new tiled grid, replacing a former grid of the same
+            name. It is filled from an array of values or with zeros."""
+        if name in self.grids:
+            self.grids.pop(name).close()
+        grid = TiledGrid(os.path.join(self.directory, name + '.tiles'), dim,
+                         dtype, self.tile_size, self.cache_tiles)
+        if values is not None:
+            grid.assign(values)
+        self.grids[name] = grid
+        return grid
+
+    @property
+    def resident_bytes(self):
+        """Memory used by the cached tiles of all grids."""
+        return sum(grid.resident_bytes for grid in self.grids.values())
+
+    def close(self):
+        for grid in self.grids.values():
+            grid.close()
+        self.grids = {}
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TiledMaze(Maze):
+    """
+    A maze whose walls are kept in a tiled grid, for mazes which are too
+    large to be held in memory as a whole. Cell-wise queries, which are all
+    a trial needs, work across tile boundaries: is_permissible(),
+    dist_to_wall(), reaches_goal() and shortest_distance_to_goal. The
+    connected components are labelled one tile at a time, see
+    label_tiles(). The whole-array analyses of Maze (labels,
+    goal_distances, sensing_table) are not available.
+    """
+
+    def __init__(self, filename, tiles_filename=None, tile_size=64,
+                 cache_tiles=64):
+        """
+        Reads a maze file line by line into a tile file, checking the walls
+        on the way. By default, the tile file is a temporary one, which is
+        removed by close() or when the maze is garbage collected.
+        """
+        with open(filename, 'r') as f_in:
+            dim = int(next(f_in))
+            rows = (np.fromstring(line, dtype=np.int64, sep=',')
+                    for line in f_in if line.strip())
+            self.build(dim, rows, tiles_filename, tile_size, cache_tiles)
+
+    @classmethod
+    def from_rows(cls, dim, rows, tiles_filename=None, tile_size=64,
+                  cache_tiles=64):
+        """Creates a tiled maze from an iterable of wall value arrays, where
+            row x holds the walls of the cells (x, 0) to (x, dim - 1)."""
+        maze = cls.__new__(cls)
+        maze.build(dim, rows, tiles_filename, tile_size, cache_tiles)
+        return maze
+
+    def build(self, dim, rows, tiles_filename, tile_size, cache_tiles):
+        """Writes the rows of walls to the tile file and performs the
+            consistency checks of Maze.validate() on the way."""
+        if dim % 2:
+            raise Exception('Maze dimensions must be even in length!')
+        self.dim = dim
+        self._finalizer = None
+        if tiles_filename is None:
+            directory = tempfile.mkdtemp(prefix='maze_tiles_')
+            tiles_filename = os.path.join(directory, 'walls.tiles')
+            self._finalizer = weakref.finalize(self, shutil.rmtree, directory,
+                                               True)
+        self.walls = TiledGrid(tiles_filename, dim, np.uint8, tile_size,
+                               cache_tiles)
+        self._edge_masks = None
+        self._labels = None
+        self._corridor_labels = None
+        self._goal_components = None
+        self._goal_distances = None
+        self._goal_path = None
+        self._race_steps = None
+        self._sensing_table = None
+        self._shortest_distance = None
+        self._tile_components = None
+
+        wall_errors = 0
+        previous = None
+        x = -1
+        for x, row in enumerate(rows):
+            row = np.asarray(row)
+            if x >= dim or row.shape != (dim,):
+                raise Exception(
+                    'Maze shape does not match dimension attribute!')
+            horizontal = ((row[:-1] & 1) != 0) != ((row[1:] & 4) != 0)
+            for y in np.flatnonzero(horizontal):
+                print('Inconsistent horizontal wall betweeen {} and {}'.format(
+                    (x, int(y)), (x, int(y) + 1)))
+            wall_errors += np.count_nonzero(horizontal)
+            if previous is not None:
+                vertical = ((previous & 2) != 0) != ((row & 8) != 0)
+                for y in np.flatnonzero(vertical):
+                    print('Inconsistent vertical wall betweeen {} and '
+                          '{}'.format((x - 1, int(y)), (x, int(y))))
+                wall_errors += np.count_nonzero(vertical)
+            self.walls.set_row(x, row)
+            previous = row
+        if x != dim - 1:
+            raise Exception('Maze shape does not match dimension attribute!')
+        if wall_errors:
+            raise Exception('Consistency errors found in wall specifications!')
+        self.walls.flush()
+
+    def whole_maze_only(self, *args):
+        raise Exception('Not available for tiled mazes!')
+
+    compute_sensing_table = whole_maze_only
+    label_components = whole_maze_only
+    distances_from = whole_maze_only
+    open_edge_masks = whole_maze_only
+
+    def tile_labels(self, number):
+        """Connected component labels of the cells of a tile, counting only
+            the paths inside the tile. The labels of different tiles are
+            distinct, those of tile number start at number * tile_size**2."""
+        size = self.walls.tile_size
+        walls = self.walls.tile(number).copy()
+        tile_x, tile_y = divmod(number, self.walls.tiles_per_side)
+        # Openings in the outer walls would lead into the padding of the
+        # last tiles, which is not part of the maze.
+        if tile_x == self.walls.tiles_per_side - 1:
+            walls[(self.dim - 1) % size, :] &= ~np.uint8(2)
+        if tile_y == self.walls.tiles_per_side - 1:
+            walls[:, (self.dim - 1) % size] &= ~np.uint8(1)
+        labels = Maze.from_walls(walls, validate=False).labels
+        return labels.astype(np.int64) + number * size * size
+
+    def label_tiles(self):
+        """
+        Labels the connected components tile by tile, see tile_labels(), and
+        joins the tile labels which are connected across the tile borders
+        with connected_components(). Only the labels of the border cells are
+        kept, so the memory needed grows with the length of the borders, not
+        with the number of cells.
+        """
+        tiles = self.walls.tiles_per_side
+        u, v = [], []
+        # Labels and openings of the right column of the tiles in the
+        # previous tile row and of the top row of the previous tile
+        right_borders = [None] * tiles
+        for tile_x in range(tiles):
+            top_border = None
+            for tile_y in range(tiles):
+                number = tile_x * tiles + tile_y
+                labels = self.tile_labels(number)
+                walls = self.walls.tile(number)
+                if right_borders[tile_y] is not None:
+                    border, is_open = right_borders[tile_y]
+                    u.append(border[is_open])
+                    v.append(labels[0, is_open])
+                if top_border is not None:
+                    border, is_open = top_border
+                    u.append(border[is_open])
+                    v.append(labels[is_open, 0])
+                right_borders[tile_y] = labels[-1, :], (walls[-1, :] & 2) != 0
+                top_border = labels[:, -1], (walls[:, -1] & 1) != 0
+        u = np.concatenate(u) if u else np.zeros(0, dtype=np.int64)
+        v = np.concatenate(v) if v else np.zeros(0, dtype=np.int64)
+        border_labels, edges = np.unique(np.concatenate([u, v]),
+                                         return_inverse=True)
+        roots = connected_components(edges[:len(u)], edges[len(u):],
+                                     len(border_labels))
+        self._tile_components = border_labels, border_labels[roots]
+
+    def component(self, cell):
+        """Returns a label of the connected component of the cell, which is
+            the same for two cells if, and only if, there is a path between
+            them. The tile borders are labelled once, on the first call."""
+        if self._tile_components is None:
+            self.label_tiles()
+        border_labels, roots = self._tile_components
+        x, y = cell
+        size = self.walls.tile_size
+        label = self.tile_labels((x // size) * self.walls.tiles_per_side +
+                                 y // size)[x % size, y % size]
+        k = np.searchsorted(border_labels, label)
+        if k < len(border_labels) and border_labels[k] == label:
+            return int(roots[k])
+        return int(label)
+
+    def reaches_goal(self, cell):
+        """Returns true if the goal room can be reached from the cell, which
+            is input as a list."""
+        if self._goal_components is None:
+            self._goal_components = {self.component(goal)
+                                     for goal in self.goal_room}
+        return self.component(tuple(cell)) in self._goal_components
+
+    @property
+    def shortest_distance_to_goal(self):
+        """Length of the shortest path from the start to the goal room, or
+            None if the goal room cannot be reached from the start."""
+        if self._shortest_distance is None:
+            distance = (self.search_goal() if self.reaches_goal([0, 0])
+                        else None)
+            self._shortest_distance = -1 if distance is None else distance
+        return (None if self._shortest_distance < 0
+                else self._shortest_distance)
+
+    @property
+    def optimal_race_steps(self):
+        """Smallest number of time steps in which the robot can get from the
+            start to the goal room, see Maze.optimal_race_steps."""
+        if self._race_steps is None:
+            steps = (self.search_goal(max_step=3) if self.reaches_goal([0, 0])
+                     else None)
+            self._race_steps = -1 if steps is None else steps
+        return None if self._race_steps < 0 else self._race_steps
+
+    def search_goal(self, start=(0, 0), max_step=1):
+        """
+        Breadth-first search from the start cell to the goal room, which
+        returns the number of moves of up to max_step cells in a straight
+        line on the shortest path. The visited cells are marked in a
+        temporary tiled grid and the frontier is a CellQueue, so that the
+        search needs no more memory than the tile caches and the queue
+        buffers.
+        """
+        goal = [self.dim // 2 - 1, self.dim // 2]
+        steps = [(1, 0, 1), (2, 1, 0), (4, 0, -1), (8, -1, 0)]
+        directory = tempfile.mkdtemp(prefix='maze_tiles_')
+        try:
+            with TiledGrid(os.path.join(directory, 'visited.tiles'), self.dim,
+                           np.uint8, self.walls.tile_size,
+                           self.walls.cache_tiles) as visited, \
+                    CellQueue(os.path.join(directory, 'frontier.cells')) \
+                    as frontier:
+                visited[tuple(start)] = 1
+                frontier.append((start[0], start[1], 0))
+                while frontier:
+                    x, y, distance = frontier.popleft()
+                    if x in goal and y in goal:
+                        return distance
+                    for value, dx, dy in steps:
+                        nx, ny = x, y
+                        for _ in range(max_step):
+                            if not (self.walls[nx, ny] & value and
+                                    0 <= nx + dx < self.dim and
+                                    0 <= ny + dy < self.dim):
+                                break
+                            nx, ny = nx + dx, ny + dy
+                            if not visited[nx, ny]:
+                                visited[nx, ny] = 1
+                                frontier.append((nx, ny, distance + 1))
+            return None
+        finally:
+            shutil.rmtree(directory, True)
+
+    def close(self):
+        self.walls.close()
+        if self._finalizer is not None:
+            self._finalizer()